@@ -0,0 +1,146 @@
+"""
+Compressed uploads: gzip or zstd CSV files, and gzip-encoded request bodies.
+
+A compressed file part (detected from its magic bytes, or its .gz/.zst
+extension) is spooled and hashed as sent and only decompressed while it is
+parsed, block by block, so the decompressed CSV never exists in memory or on
+disk. Parquet and Arrow IPC compress their pages internally and need random
+access, so only CSV is accepted compressed.
+
+A request sent with `Content-Encoding: gzip` is decompressed by
+DecompressRequestMiddleware as it is received, before the multipart parser
+sees it; the file part then arrives as plain CSV, Parquet or Arrow IPC.
+"""
+
+import gzip
+import io
+import os
+import zlib
+from typing import IO, Optional
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .schemas import UPLOAD_FORMAT_EXTENSIONS, UploadCompression, UploadFormat
+
+# Upper bound of the decompressed bytes produced from one read or request body message
+DECOMPRESS_BLOCK_BYTES = 1024 * 1024
+
+COMPRESSION_MAGIC = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.gzip': 'gzip',
+    '.zst': 'zstd',
+    '.zstd': 'zstd',
+}
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+# Request Content-Encodings DecompressRequestMiddleware decodes
+REQUEST_ENCODINGS = {'gzip', 'x-gzip'}
+
+def detect_compression(filename: str, source: IO[bytes]) -> Optional[UploadCompression]:
+    """Detect a compressed upload from its magic bytes, falling back to the file extension"""
+    head = source.read(max(len(magic) for magic in COMPRESSION_MAGIC.values()))
+    source.seek(0)
+    for compression, magic in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return compression
+    return COMPRESSION_EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+
+def compressed_format(filename: str) -> UploadFormat:
+    """Format of the file inside a compressed upload: CSV, unless its name says otherwise"""
+    name, extension = os.path.splitext(filename or '')
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        extension = os.path.splitext(name)[1]
+    if UPLOAD_FORMAT_EXTENSIONS.get(extension.lower(), 'csv') != 'csv':
+        raise ValueError("Only CSV files can be uploaded compressed; Parquet and Arrow IPC compress internally")
+    return 'csv'
+
+def open_decompressed(source: IO[bytes], compression: Optional[UploadCompression]) -> IO[bytes]:
+    """Wrap source in a reader decompressing it as it is read; source itself if not compressed"""
+    if compression is None:
+        return source
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=source, mode='rb')
+
+    import zstandard
+
+    # Files written by `zstd` or multithreaded compressors may hold several frames
+    reader = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True, closefd=False)
+    # Buffered for readline(), which the parallel parser uses to end chunks on a line
+    return io.BufferedReader(reader, DECOMPRESS_BLOCK_BYTES)
+
+class DecompressRequestMiddleware:
+    """Decompress gzip-encoded request bodies while they are received
+
+    Bodies are inflated message by message, at most DECOMPRESS_BLOCK_BYTES at
+    a time, so a small compressed message can't expand into a large buffer.
+    Content-Encoding and Content-Length are removed from the request seen by
+    the app. Other encodings are rejected with 415.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        encoding = Headers(scope=scope).get('content-encoding', 'identity').strip().lower()
+        if encoding == 'identity':
+            await self.app(scope, receive, send)
+            return
+        if encoding not in REQUEST_ENCODINGS:
+            response = JSONResponse({'detail': f"Unsupported Content-Encoding: {encoding}"}, status_code=415)
+            await response(scope, receive, send)
+            return
+
+        scope = dict(scope)
+        scope['headers'] = [
+            (name, value) for name, value in scope['headers'] if name not in (b'content-encoding', b'content-length')
+        ]
+        await self.app(scope, GzipBodyReceiver(receive), send)
+
+class GzipBodyReceiver:
+    """ASGI receive callable yielding the inflated body of a gzip-encoded request"""
+
+    def __init__(self, receive: Receive):
+        self.receive = receive
+        self.decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        self.pending = b''
+        self.more_body = True
+        self.done = False
+
+    def inflate(self) -> bytes:
+        block = self.decompressor.decompress(self.pending, DECOMPRESS_BLOCK_BYTES)
+        self.pending = self.decompressor.unconsumed_tail
+        if self.decompressor.eof and self.decompressor.unused_data:
+            # Concatenated gzip members, as written by `cat a.gz b.gz`; at the end
+            # of a member all remaining input is in unused_data
+            self.pending = self.decompressor.unused_data
+            self.decompressor = zlib.decompressobj(wbits=zlib.MAX_WBITS | 16)
+        return block
+
+    async def __call__(self) -> Message:
+        if self.done:
+            # Only http.disconnect is left to receive
+            return await self.receive()
+
+        while not self.pending and self.more_body:
+            message = await self.receive()
+            if message['type'] != 'http.request':
+                return message
+            self.pending = message.get('body', b'')
+            self.more_body = message.get('more_body', False)
+
+        block = self.inflate() if self.pending else b''
+        if not self.pending and not self.more_body:
+            if not self.decompressor.eof:
+                raise ValueError("Truncated gzip request body")
+            block += self.decompressor.flush()
+            self.done = True
+            return {'type': 'http.request', 'body': block, 'more_body': False}
+        return {'type': 'http.request', 'body': block, 'more_body': True}
@@ -1,26 +1,113 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from typing import List, Dict, Any
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, deque
+from typing import List, Dict, Any, IO, Iterator, Optional
+from sqlalchemy import Integer, any_, bindparam, select, text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Session
-from .models import Employee
+from sqlalchemy.util import await_only
+from .data_version import bump_data_version, publish_data_version
+from .models import Employee, EmployeeFingerprint
+from .partitions import ensure_year_partitions
+from .reference_index import ReferenceIds, reference_index
+from .rollup import ROLLUP_INCREMENT_SQL, add_hires
+from .schemas import EMPLOYEE_COLUMNS, UPLOAD_FORMAT_EXTENSIONS, UploadFormat
+from .timing import timed
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Why employee rows are dropped while cleaning, in the order they are checked
+EMPLOYEE_REJECT_REASONS = [
+    'missing_name', 'missing_datetime', 'invalid_id', 'invalid_datetime', 'unknown_department', 'unknown_job'
+]
+REFERENCE_REJECT_REASONS = ['unknown_department', 'unknown_job']
+
+# Parallel parsing of employee uploads: default worker processes (1 parses
+# in-process) and approximate bytes of CSV handed to a worker at a time
+EMPLOYEE_PARSE_WORKERS = int(os.getenv("EMPLOYEE_PARSE_WORKERS", "1"))
+EMPLOYEE_PARSE_CHUNK_BYTES = int(os.getenv("EMPLOYEE_PARSE_CHUNK_BYTES", str(8 * 1024 * 1024)))
+
+UPLOAD_FORMAT_NAMES = {'csv': 'CSV', 'parquet': 'Parquet', 'arrow': 'Arrow IPC'}
+
+# Arrow IPC files start with ARROW1; IPC streams with a 0xFFFFFFFF continuation marker
+PARQUET_MAGIC = b'PAR1'
+ARROW_FILE_MAGIC = b'ARROW1'
+ARROW_STREAM_MAGIC = b'\xff\xff\xff\xff'
+
+# Session-scoped staging table; rows are discarded when the transaction ends
+EMPLOYEES_STAGING_DDL = """
+    CREATE TEMP TABLE IF NOT EXISTS employees_staging (
+        id INTEGER,
+        name VARCHAR,
+        datetime TIMESTAMP,
+        department_id INTEGER,
+        job_id INTEGER,
+        fingerprint BIGINT
+    ) ON COMMIT DELETE ROWS
+"""
+
+STAGING_COLUMNS = EMPLOYEE_COLUMNS + ['fingerprint']
+
+EMPLOYEES_COPY_SQL = (
+    f"COPY employees_staging ({', '.join(STAGING_COLUMNS)}) "
+    "FROM STDIN WITH (FORMAT csv)"
+)
+
+# Inserts new employees and increments hiring_rollup with them in one
+# statement, returning the number of inserted rows and the ids refused for an
+# unknown department, then for an unknown job. The partitioned table is only
+# unique on (id, datetime), so existing and repeated ids are skipped here.
+# Batches were checked against the reference index already; the EXISTS checks
+# only refuse ids deleted since, without aborting the whole batch
+EMPLOYEES_MERGE_SQL = f"""
+    WITH checked AS (
+        SELECT s.*,
+               s.department_id IS NULL
+               OR EXISTS (SELECT 1 FROM departments d WHERE d.id = s.department_id) AS department_known,
+               s.job_id IS NULL
+               OR EXISTS (SELECT 1 FROM jobs j WHERE j.id = s.job_id) AS job_known
+        FROM employees_staging s
+    ), inserted AS (
+        INSERT INTO employees (id, name, datetime, department_id, job_id)
+        SELECT DISTINCT ON (c.id) c.id, c.name, c.datetime, c.department_id, c.job_id
+        FROM checked c
+        WHERE c.department_known AND c.job_known
+          AND NOT EXISTS (SELECT 1 FROM employees e WHERE e.id = c.id)
+        ORDER BY c.id
+        ON CONFLICT DO NOTHING
+        RETURNING datetime, department_id, job_id
+    ), rollup AS ({ROLLUP_INCREMENT_SQL})
+    SELECT (SELECT count(*) FROM inserted),
+           ARRAY(SELECT id FROM checked WHERE NOT department_known),
+           ARRAY(SELECT id FROM checked WHERE department_known AND NOT job_known)
+"""
+
+# The partitioned table can't enforce unique ids, and NOT EXISTS doesn't see
+# rows of merges that haven't committed, so merges take turns: the lock is
+# held until the batch commits, and each merge sees the ids committed before it
+EMPLOYEES_MERGE_LOCK_KEY = 0x6d657267
+
+# Refused rows aren't fingerprinted, so resending them retries them
+EMPLOYEES_STAGING_REFUSED_DELETE_SQL = "DELETE FROM employees_staging WHERE id = ANY(:ids)"
+
+# Fingerprints of the batch as uploaded, whether its rows were inserted or not
+EMPLOYEE_FINGERPRINTS_UPSERT_SQL = """
+    INSERT INTO employee_fingerprints (id, fingerprint)
+    SELECT DISTINCT ON (id) id, fingerprint FROM employees_staging ORDER BY id
+    ON CONFLICT (id) DO UPDATE SET fingerprint = EXCLUDED.fingerprint
+"""
+
 class CSVProcessor:
     @staticmethod
     def process_departments_csv(file_content: bytes) -> List[Dict[str, Any]]:
         """Process departments CSV and return list of department dicts"""
         try:
-            df = pd.read_csv(pd.io.common.BytesIO(file_content), header=None, names=['id', 'department'])
-
-            # Clean and validate data
-            df = df.dropna()
-            df['id'] = pd.to_numeric(df['id'], errors='coerce')
-            df['department'] = df['department'].astype(str).str.strip()
-            df = df.dropna()
-
-            return df.to_dict('records')
+            return CSVProcessor.process_reference_csv(file_content, 'department')
         except Exception as e:
             logger.error(f"Error processing departments CSV: {e}")
             raise ValueError("Invalid departments CSV format")
@@ -29,138 +116,516 @@ class CSVProcessor:
     def process_jobs_csv(file_content: bytes) -> List[Dict[str, Any]]:
         """Process jobs CSV and return list of job dicts"""
         try:
-            df = pd.read_csv(pd.io.common.BytesIO(file_content), header=None, names=['id', 'job'])
-
-            # Clean and validate data
-            df = df.dropna()
-            df['id'] = pd.to_numeric(df['id'], errors='coerce')
-            df['job'] = df['job'].astype(str).str.strip()
-            df = df.dropna()
-
-            return df.to_dict('records')
+            return CSVProcessor.process_reference_csv(file_content, 'job')
         except Exception as e:
             logger.error(f"Error processing jobs CSV: {e}")
             raise ValueError("Invalid jobs CSV format")
 
     @staticmethod
-    def process_employees_csv(file_content: bytes, batch_size: int = 1000) -> List[List[Dict[str, Any]]]:
-        """Process employees CSV and return list of batches of employee dicts"""
+    def process_reference_csv(file_content: bytes, name_column: str) -> List[Dict[str, Any]]:
+        """Parse an (id, name) CSV into dicts, keeping the last row of repeated ids"""
+        with timed('parse'):
+            df = pd.read_csv(io.BytesIO(file_content), header=None, dtype=str)
+        if df.shape[1] != 2:
+            raise ValueError(f"Expected 2 columns, found {df.shape[1]}")
+        df.columns = ['id', name_column]
+        with timed('validate'):
+            return CSVProcessor.clean_reference_frame(df, name_column)
+
+    @staticmethod
+    def process_columnar_reference(source: IO[bytes], fmt: UploadFormat, name_column: str) -> List[Dict[str, Any]]:
+        """Read an (id, name) Parquet or Arrow IPC file into dicts like process_reference_csv"""
+        try:
+            with timed('read'):
+                table = CSVProcessor.read_columnar_table(source, fmt)
+            with timed('parse'):
+                df = CSVProcessor.map_columns(table.to_pandas(), ['id', name_column])
+            with timed('validate'):
+                return CSVProcessor.clean_reference_frame(df, name_column)
+        except Exception as e:
+            logger.error(f"Error processing {name_column}s {UPLOAD_FORMAT_NAMES[fmt]} file: {e}")
+            raise ValueError(f"Invalid {name_column}s {UPLOAD_FORMAT_NAMES[fmt]} file")
+
+    @staticmethod
+    def clean_reference_frame(df: pd.DataFrame, name_column: str) -> List[Dict[str, Any]]:
+        """Turn an (id, name) frame into dicts, keeping the last row of repeated ids"""
+        # Clean and validate data
+        df['id'] = pd.to_numeric(df['id'], errors='coerce')
+        df[name_column] = df[name_column].astype('string').str.strip()
+        df = df.dropna()
+        df = df[df['id'] % 1 == 0].drop_duplicates('id', keep='last')
+
+        return [
+            {'id': int(record_id), name_column: name}
+            for record_id, name in zip(df['id'], df[name_column])
+        ]
+
+    @staticmethod
+    def process_employees_csv(
+        file_content: bytes, batch_size: int = 1000, reference: Optional[ReferenceIds] = None
+    ) -> List[pd.DataFrame]:
+        """Process employees CSV and return list of cleaned employee batches"""
+        return list(CSVProcessor.iter_employee_batches(io.BytesIO(file_content), batch_size, reference))
+
+    @staticmethod
+    def iter_employee_batches(
+        source: IO[bytes], batch_size: int = 1000, reference: Optional[ReferenceIds] = None, line_offset: int = 0
+    ) -> Iterator[pd.DataFrame]:
+        """Stream employees CSV from a file object, yielding one cleaned batch per chunk
+
+        Only one chunk of batch_size rows is held in memory at a time. Chunks
+        whose rows were all rejected still yield an empty batch carrying the
+        rejects. Rows are indexed by their line in the file, after line_offset
+        lines that precede source.
+        """
         try:
-            df = pd.read_csv(
-                pd.io.common.BytesIO(file_content),
+            reader = pd.read_csv(
+                source,
                 header=None,
-                names=['id', 'name', 'datetime', 'department_id', 'job_id']
+                names=EMPLOYEE_COLUMNS,
+                dtype={'name': str, 'datetime': str},
+                # Blank lines are read as empty rows so the index keeps counting them
+                skip_blank_lines=False,
+                chunksize=batch_size
             )
 
-            # Clean and validate data
-            df = df.dropna(subset=['name', 'datetime'])  # Required fields
+            while True:
+                # Reading and tokenizing happen together inside pandas
+                with timed('parse'):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    return
+                chunk = chunk.dropna(how='all')
+                # Chunks continue the row numbering of the previous ones
+                chunk.index += line_offset
+                with timed('validate'):
+                    batch = CSVProcessor.clean_employees_frame(chunk, reference)
+                if not batch.empty or batch.attrs['rejected']:
+                    yield batch
+        except Exception as e:
+            logger.error(f"Error processing employees CSV: {e}")
+            raise ValueError("Invalid employees CSV format")
+
+    @staticmethod
+    def iter_employee_batches_parallel(
+        source: IO[bytes],
+        batch_size: int = 1000,
+        workers: int = EMPLOYEE_PARSE_WORKERS,
+        chunk_bytes: int = EMPLOYEE_PARSE_CHUNK_BYTES,
+        reference: Optional[ReferenceIds] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Parse employees CSV in a process pool, yielding cleaned batches in file order
+
+        The file is cut into chunks of about chunk_bytes ending on a line boundary,
+        so quoted names spanning several lines are not supported. Each chunk is
+        handed over with the number of lines before it, to keep line numbers. At most two chunks
+        per worker are in flight, which bounds memory like iter_employee_batches.
+        """
+        if workers <= 1:
+            yield from CSVProcessor.iter_employee_batches(source, batch_size, reference)
+            return
 
-            # Convert columns to proper types
-            df['id'] = pd.to_numeric(df['id'], errors='coerce').astype('Int64')
-            df['department_id'] = pd.to_numeric(df['department_id'], errors='coerce').astype('Int64')
-            df['job_id'] = pd.to_numeric(df['job_id'], errors='coerce').astype('Int64')
+        # Spawned workers don't inherit the event loop, threads or pooled connections
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        pending = deque()
 
-            # Validate ranges
-            df = df[
-                (df['department_id'].isna() | ((df['department_id'] >= 1) & (df['department_id'] <= 12))) &
-                (df['job_id'].isna() | ((df['job_id'] >= 1) & (df['job_id'] <= 183)))
-            ]
+        def next_result() -> List[pd.DataFrame]:
+            # Time spent waiting on the workers, which parse and validate
+            with timed('parse'):
+                return pending.popleft().result()
 
-            # Convert datetime strings to datetime objects
-            df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
+        try:
+            chunks = CSVProcessor.iter_line_chunks(source, chunk_bytes)
+            line_offset = 0
+            while True:
+                with timed('read'):
+                    chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.append(executor.submit(parse_employee_chunk, chunk, batch_size, reference, line_offset))
+                line_offset += chunk.count(b'\n')
+                if len(pending) >= 2 * workers:
+                    yield from next_result()
+            while pending:
+                yield from next_result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-            # Remove rows with invalid datetime or ID
-            df = df.dropna(subset=['datetime', 'id'])
+    @staticmethod
+    def iter_columnar_employee_batches(
+        source: IO[bytes],
+        fmt: UploadFormat,
+        batch_size: int = 1000,
+        reference: Optional[ReferenceIds] = None
+    ) -> Iterator[pd.DataFrame]:
+        """Stream a Parquet or Arrow IPC employees file, yielding one cleaned batch per record batch
 
-            # Convert nullable integers to regular integers for SQLAlchemy compatibility
-            df['id'] = df['id'].astype(int)
+        Columns are matched by name (or by position when all five are present
+        under other names) and typed values skip text parsing entirely.
+        """
+        try:
+            record_batches = CSVProcessor.iter_record_batches(source, fmt, batch_size)
+            rows_read = 0
+            while True:
+                with timed('read'):
+                    record_batch = next(record_batches, None)
+                if record_batch is None:
+                    return
+                with timed('parse'):
+                    df = CSVProcessor.map_columns(record_batch.to_pandas(date_as_object=False), EMPLOYEE_COLUMNS)
+                    df.index = pd.RangeIndex(rows_read, rows_read + len(df))
+                    rows_read += len(df)
+                with timed('validate'):
+                    batch = CSVProcessor.clean_employees_frame(df, reference)
+                if not batch.empty or batch.attrs['rejected']:
+                    yield batch
+        except Exception as e:
+            logger.error(f"Error processing employees {UPLOAD_FORMAT_NAMES[fmt]} file: {e}")
+            raise ValueError(f"Invalid employees {UPLOAD_FORMAT_NAMES[fmt]} file")
 
-            # Handle nullable columns properly
-            def safe_nullable_int(value):
-                return None if pd.isna(value) else int(value)
+    @staticmethod
+    def detect_format(filename: str, source: IO[bytes]) -> UploadFormat:
+        """Detect the upload format from its magic bytes, falling back to the file extension"""
+        head = source.read(len(ARROW_FILE_MAGIC))
+        source.seek(0)
+        if head.startswith(PARQUET_MAGIC):
+            return 'parquet'
+        if head.startswith(ARROW_FILE_MAGIC) or head.startswith(ARROW_STREAM_MAGIC):
+            return 'arrow'
 
-            df['department_id'] = df['department_id'].apply(safe_nullable_int)
-            df['job_id'] = df['job_id'].apply(safe_nullable_int)
+        fmt = UPLOAD_FORMAT_EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+        if fmt is None:
+            raise ValueError("File must be CSV, Parquet or Arrow IPC format")
+        return fmt
 
-            # Split into batches
-            batches = []
-            for i in range(0, len(df), batch_size):
-                batch_df = df.iloc[i:i+batch_size]
+    @staticmethod
+    def open_arrow_reader(source: IO[bytes]):
+        """Open an Arrow IPC file or stream reader, whichever the source contains"""
+        import pyarrow as pa
 
-                # Convert to dict and ensure proper Python types
-                batch_records = []
-                for _, row in batch_df.iterrows():
-                    record = {
-                        'id': int(row['id']),
-                        'name': str(row['name']),
-                        'datetime': row['datetime'].to_pydatetime() if pd.notna(row['datetime']) else None,
-                        'department_id': int(row['department_id']) if pd.notna(row['department_id']) else None,
-                        'job_id': int(row['job_id']) if pd.notna(row['job_id']) else None
-                    }
-                    batch_records.append(record)
+        is_file = source.read(len(ARROW_FILE_MAGIC)) == ARROW_FILE_MAGIC
+        source.seek(0)
+        return pa.ipc.open_file(source) if is_file else pa.ipc.open_stream(source)
 
-                batches.append(batch_records)
+    @staticmethod
+    def read_columnar_table(source: IO[bytes], fmt: UploadFormat):
+        """Read a whole Parquet or Arrow IPC file into a pyarrow Table"""
+        import pyarrow.parquet as pq
 
-            return batches
-        except Exception as e:
-            logger.error(f"Error processing employees CSV: {e}")
-            raise ValueError("Invalid employees CSV format")
+        if fmt == 'parquet':
+            return pq.read_table(source)
+        return CSVProcessor.open_arrow_reader(source).read_all()
 
     @staticmethod
-    def validate_employee_data(employee_data: Dict[str, Any]) -> bool:
-        """Validate individual employee data"""
-        required_fields = ['name', 'datetime']
-        for field in required_fields:
-            if not employee_data.get(field):
-                return False
+    def iter_record_batches(source: IO[bytes], fmt: UploadFormat, batch_size: int) -> Iterator[Any]:
+        """Stream pyarrow record batches of at most batch_size rows from a columnar file"""
+        import pyarrow.parquet as pq
+
+        if fmt == 'parquet':
+            yield from pq.ParquetFile(source).iter_batches(batch_size=batch_size)
+            return
+
+        reader = CSVProcessor.open_arrow_reader(source)
+        if hasattr(reader, 'num_record_batches'):
+            record_batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            record_batches = reader
 
-        # Validate datetime format
-        if isinstance(employee_data['datetime'], str):
-            try:
-                datetime.fromisoformat(employee_data['datetime'].replace('Z', '+00:00'))
-            except ValueError:
-                return False
+        # IPC batches keep the writer's sizes, so split them to batch_size
+        for record_batch in record_batches:
+            for offset in range(0, record_batch.num_rows, batch_size):
+                yield record_batch.slice(offset, batch_size)
 
-        return True
+    @staticmethod
+    def map_columns(df: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        """Select columns by name, or rename them positionally when the count matches"""
+        if set(columns) <= set(df.columns):
+            return df[columns].copy()
+        if len(df.columns) == len(columns):
+            return df.set_axis(columns, axis=1)
+        raise ValueError(f"Expected columns {columns}, found {list(df.columns)}")
+
+    @staticmethod
+    def iter_line_chunks(source: IO[bytes], chunk_bytes: int) -> Iterator[bytes]:
+        """Read source in blocks of about chunk_bytes, each extended to the end of its last line"""
+        while True:
+            chunk = source.read(chunk_bytes)
+            if not chunk:
+                return
+            if not chunk.endswith(b'\n'):
+                chunk += source.readline()
+            yield chunk
 
     @staticmethod
-    def save_batch_to_db(db: Session, employees_data: List[Dict[str, Any]]) -> tuple[int, List[str]]:
-        """Save batch of employees to database"""
+    def clean_employees_frame(df: pd.DataFrame, reference: Optional[ReferenceIds] = None) -> pd.DataFrame:
+        """Validate and convert a frame of raw employee rows, one column at a time
+
+        Returns a frame with EMPLOYEE_COLUMNS: Int64 ids (nullable FKs), str names
+        and naive UTC datetime64 hire dates, ready to be written by save_batch_to_db.
+        With reference, department and job ids must also be known to it. How many
+        rows were dropped for each of EMPLOYEE_REJECT_REASONS is left in the
+        returned frame's attrs['rejected'] and, if any were, the dropped rows in
+        attrs['rejects'] with their line (the frame's index + 1), reason and
+        values as read (ids as parsed when they were integral).
+        """
+        # Convert columns to proper types; non-integral values become NA
+        ids = {}
+        for column in ('id', 'department_id', 'job_id'):
+            values = pd.to_numeric(df[column], errors='coerce')
+            ids[column] = values.where(values % 1 == 0).astype('Int64')
+
+        if pd.api.types.is_datetime64_any_dtype(df['datetime']):
+            # Typed timestamps from columnar uploads; naive ones are taken as UTC
+            hired_at = df['datetime']
+            hired_at = hired_at.dt.tz_convert('UTC') if hired_at.dt.tz is not None else hired_at.dt.tz_localize('UTC')
+        else:
+            hired_at = pd.to_datetime(df['datetime'], errors='coerce', utc=True, format='ISO8601')
+
+        def unknown(values: pd.Series, known: Optional[np.ndarray]) -> np.ndarray:
+            if known is None:
+                return np.zeros(len(values), dtype=bool)
+            return (values.notna() & ~values.isin(known)).fillna(False).to_numpy(dtype=bool)
+
+        # First failing check of each row, '' for valid rows
+        reasons = np.select([
+            df['name'].isna().to_numpy(),
+            df['datetime'].isna().to_numpy(),
+            ids['id'].isna().to_numpy(dtype=bool),
+            hired_at.isna().to_numpy(),
+            unknown(ids['department_id'], reference and reference.department_ids),
+            unknown(ids['job_id'], reference and reference.job_ids),
+        ], EMPLOYEE_REJECT_REASONS, default='')
+        valid = reasons == ''
+
+        batch = pd.DataFrame({
+            'id': ids['id'][valid],
+            'name': df['name'][valid].astype(str),
+            'datetime': hired_at[valid].dt.tz_localize(None),
+            'department_id': ids['department_id'][valid],
+            'job_id': ids['job_id'][valid]
+        })
+        batch.attrs['rejected'] = {
+            reason: int(count) for reason, count in pd.Series(reasons[~valid]).value_counts().items()
+        }
+        if not valid.all():
+            rejected = ~valid
+            raw = {column: df[column][rejected] for column in ('name', 'datetime')}
+            for column, values in ids.items():
+                values = values[rejected]
+                raw[column] = values.astype(object).where(values.notna(), df[column][rejected])
+            batch.attrs['rejects'] = pd.DataFrame({
+                'line': np.asarray(df.index[rejected]) + 1,
+                'reason': reasons[rejected],
+                **{column: raw[column].to_numpy() for column in EMPLOYEE_COLUMNS}
+            })
+        return batch
+
+    @staticmethod
+    def readmit_known_references(db: Session, batch: pd.DataFrame) -> pd.DataFrame:
+        """Validate again rows rejected for a department or job unknown to the reference index
+
+        The index of a process only follows its own departments/jobs uploads, so
+        ids added by other workers or loaded directly are looked up (only those
+        missing from the index) before the rows are given up. Readmitted rows
+        join the batch in file order and leave its attrs['rejected'] and
+        attrs['rejects'].
+        """
+        rejects = batch.attrs.get('rejects')
+        if rejects is None:
+            return batch
+        unknown = rejects['reason'].isin(REFERENCE_REJECT_REASONS).to_numpy()
+        if not unknown.any():
+            return batch
+
+        candidates = rejects[unknown]
+        reference = reference_index.refresh(db, *(
+            pd.to_numeric(candidates[column], errors='coerce').dropna().to_numpy(dtype=np.int64)
+            for column in ('department_id', 'job_id')
+        ))
+        rechecked = CSVProcessor.clean_employees_frame(
+            candidates[EMPLOYEE_COLUMNS].set_axis(candidates['line'].to_numpy() - 1), reference
+        )
+
+        rejected = Counter(batch.attrs.pop('rejected'))
+        rejected.subtract(Counter(candidates['reason']))
+        rejected.update(rechecked.attrs.pop('rejected'))
+        still_rejected = [rejects[~unknown], rechecked.attrs.pop('rejects', rejects.iloc[:0])]
+        del batch.attrs['rejects']
+
+        # Both frames' attrs are empty now, which concat requires to keep them
+        readmitted = pd.concat([batch, rechecked]).sort_index()
+        readmitted.attrs['rejected'] = {reason: count for reason, count in rejected.items() if count}
+        still_rejected = pd.concat(still_rejected).sort_values('line', ignore_index=True)
+        if not still_rejected.empty:
+            readmitted.attrs['rejects'] = still_rejected
+        return readmitted
+
+    @staticmethod
+    def row_fingerprints(batch: pd.DataFrame) -> np.ndarray:
+        """64-bit hash of each cleaned employee row, signed to fit a BIGINT"""
+        # Columnar uploads may carry other datetime resolutions than CSV ones
+        columns = batch[EMPLOYEE_COLUMNS].assign(datetime=batch['datetime'].astype('datetime64[ns]'))
+        return pd.util.hash_pandas_object(columns, index=False).to_numpy().view(np.int64)
+
+    @staticmethod
+    def drop_unchanged_rows(db: Session, batch: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+        """Drop rows whose fingerprint matches the one stored by the previous load
+
+        Returns the remaining rows, with their fingerprint column, and the number dropped.
+        """
+        fingerprints = CSVProcessor.row_fingerprints(batch)
+        ids = batch['id'].to_numpy(dtype=np.int64)
+
+        query = select(EmployeeFingerprint.id, EmployeeFingerprint.fingerprint)
+        if db.get_bind().dialect.name == 'postgresql':
+            # One array parameter instead of one bind parameter per id
+            query = query.where(EmployeeFingerprint.id == any_(bindparam('ids', ids.tolist(), type_=ARRAY(Integer))))
+        else:
+            query = query.where(EmployeeFingerprint.id.in_(ids.tolist()))
+        stored = db.execute(query).all()
+
+        stored_ids = pd.Index([row[0] for row in stored], dtype=np.int64)
+        stored_fingerprints = np.fromiter((row[1] for row in stored), dtype=np.int64, count=len(stored))
+        unchanged = np.zeros(len(batch), dtype=bool)
+        if stored:
+            positions = stored_ids.get_indexer(ids)
+            unchanged = (positions >= 0) & (stored_fingerprints[positions] == fingerprints)
+
+        return batch[~unchanged].assign(fingerprint=fingerprints[~unchanged]), int(unchanged.sum())
+
+    @staticmethod
+    def save_batch_to_db(db: Session, batch: pd.DataFrame) -> tuple[int, int, List[str]]:
+        """Save a cleaned employee batch to database, returning (inserted, skipped, errors)"""
+        if db.get_bind().dialect.name == 'postgresql':
+            return CSVProcessor.copy_batch_to_db(db, batch)
+        return CSVProcessor.orm_batch_to_db(db, batch)
+
+    @staticmethod
+    def copy_batch_to_db(db: Session, batch: pd.DataFrame) -> tuple[int, int, List[str]]:
+        """Stage batch with COPY FROM STDIN and merge it with a single INSERT ... ON CONFLICT
+
+        Rows whose department or job no longer exists are left out of both
+        counts; they are returned in batch.attrs['refused'] with their line
+        and reason, like the rejects of clean_employees_frame.
+        """
+        errors = []
+        if batch.empty:
+            return 0, 0, errors
+
+        # Nullable ids are written as empty fields, which COPY loads as NULL
+        with timed('write'):
+            staged = batch if 'fingerprint' in batch else batch.assign(fingerprint=CSVProcessor.row_fingerprints(batch))
+            payload = staged.to_csv(header=False, index=False, columns=STAGING_COLUMNS)
+
+        try:
+            with timed('write'):
+                ensure_year_partitions(db, batch['datetime'].dt.year.unique())
+                db.execute(text(EMPLOYEES_STAGING_DDL))
+                CSVProcessor.copy_to_staging(db, payload)
+                db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": EMPLOYEES_MERGE_LOCK_KEY})
+                inserted_count, unknown_departments, unknown_jobs = db.execute(text(EMPLOYEES_MERGE_SQL)).one()
+                if unknown_departments or unknown_jobs:
+                    db.execute(text(EMPLOYEES_STAGING_REFUSED_DELETE_SQL), {"ids": unknown_departments + unknown_jobs})
+                db.execute(text(EMPLOYEE_FINGERPRINTS_UPSERT_SQL))
+                stamp = bump_data_version(db) if inserted_count else None
+
+            with timed('commit'):
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            errors.append(f"Database commit error: {str(e)}")
+            return 0, 0, errors
+
+        # Each batch commits on its own, so cached metrics go stale per batch
+        if stamp:
+            publish_data_version(stamp)
+
+        refused_count = 0
+        if unknown_departments or unknown_jobs:
+            reasons = np.select(
+                [batch['id'].isin(unknown_departments).to_numpy(), batch['id'].isin(unknown_jobs).to_numpy()],
+                REFERENCE_REJECT_REASONS, default=''
+            )
+            refused = batch[reasons != '']
+            refused_count = len(refused)
+            batch.attrs['refused'] = refused[EMPLOYEE_COLUMNS].assign(
+                line=refused.index + 1, reason=reasons[reasons != '']
+            )
+
+        skipped_count = len(batch) - inserted_count - refused_count
+
+        return inserted_count, skipped_count, errors
+
+    @staticmethod
+    def copy_to_staging(db: Session, payload: str) -> None:
+        """COPY CSV payload into employees_staging within the session's transaction"""
+        dbapi_connection = db.connection().connection
+        if db.get_bind().dialect.driver == 'asyncpg':
+            # Reached through AsyncSession.run_sync, whose greenlet can await the driver
+            await_only(dbapi_connection.driver_connection.copy_to_table(
+                'employees_staging', source=io.BytesIO(payload.encode()), columns=STAGING_COLUMNS, format='csv'
+            ))
+        else:
+            with dbapi_connection.cursor() as cursor:
+                cursor.copy_expert(EMPLOYEES_COPY_SQL, io.StringIO(payload))
+
+    @staticmethod
+    def orm_batch_to_db(db: Session, batch: pd.DataFrame) -> tuple[int, int, List[str]]:
+        """Save batch of employees row by row through the ORM (non-PostgreSQL engines)"""
         saved_count = 0
+        skipped_count = 0
         errors = []
+        hires = Counter()
 
-        for emp_data in employees_data:
-            try:
-                # Validate data
-                if not CSVProcessor.validate_employee_data(emp_data):
-                    errors.append(f"Invalid data for employee ID {emp_data.get('id', 'unknown')}")
-                    continue
-
-                # Check if employee already exists
-                existing = db.query(Employee).filter(Employee.id == emp_data['id']).first()
-                if existing:
-                    continue  # Skip duplicates
-
-                # Create employee record
-                employee = Employee(
-                    id=emp_data['id'],
-                    name=emp_data['name'],
-                    datetime=emp_data['datetime'] if isinstance(emp_data['datetime'], datetime)
-                           else datetime.fromisoformat(emp_data['datetime'].replace('Z', '+00:00')),
-                    department_id=emp_data.get('department_id'),
-                    job_id=emp_data.get('job_id')
-                )
-
-                db.add(employee)
-                saved_count += 1
-
-            except Exception as e:
-                errors.append(f"Error saving employee ID {emp_data.get('id', 'unknown')}: {str(e)}")
+        with timed('write'):
+            for emp_id, name, hired_at, department_id, job_id in batch[EMPLOYEE_COLUMNS].itertuples(index=False):
+                try:
+                    # Check if employee already exists
+                    existing = db.query(Employee).filter(Employee.id == int(emp_id)).first()
+                    if existing:
+                        skipped_count += 1
+                        continue  # Skip duplicates
+
+                    # Create employee record
+                    employee = Employee(
+                        id=int(emp_id),
+                        name=name,
+                        datetime=hired_at.to_pydatetime(),
+                        department_id=None if pd.isna(department_id) else int(department_id),
+                        job_id=None if pd.isna(job_id) else int(job_id)
+                    )
+
+                    db.add(employee)
+                    saved_count += 1
+                    hires[(hired_at.year, hired_at.quarter, employee.department_id, employee.job_id)] += 1
+
+                except Exception as e:
+                    errors.append(f"Error saving employee ID {emp_id}: {str(e)}")
 
         try:
-            db.commit()
+            with timed('write'):
+                fingerprints = batch['fingerprint'] if 'fingerprint' in batch else CSVProcessor.row_fingerprints(batch)
+                for emp_id, fingerprint in zip(batch['id'], fingerprints):
+                    db.merge(EmployeeFingerprint(id=int(emp_id), fingerprint=int(fingerprint)))
+                add_hires(db, hires)
+                stamp = bump_data_version(db) if saved_count else None
+            with timed('commit'):
+                db.commit()
         except Exception as e:
             db.rollback()
             errors.append(f"Database commit error: {str(e)}")
+            return 0, 0, errors
+
+        if stamp:
+            publish_data_version(stamp)
+
+        return saved_count, skipped_count, errors
 
-        return saved_count, errors
+def parse_employee_chunk(
+    chunk: bytes, batch_size: int, reference: Optional[ReferenceIds] = None, line_offset: int = 0
+) -> List[pd.DataFrame]:
+    """Clean one line-aligned chunk of employees CSV (runs in a parse worker process)"""
+    if not chunk.strip():
+        # Blank trailing lines that ended up in a chunk of their own
+        return []
+    return list(CSVProcessor.iter_employee_batches(io.BytesIO(chunk), batch_size, reference, line_offset))
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from .cache import metrics_cache
+from .models import DataVersion
+
+# Seconds a process trusts its copy of the version before reading the row again. Changes
+# committed by other workers, replicas or the CLI show up in ETags (and drop cached
+# metrics) at most this late; changes made by the process itself show up at once.
+DATA_VERSION_REFRESH_SECONDS = float(os.getenv("DATA_VERSION_REFRESH_SECONDS", "1"))
+
+# (version, updated_at) written by a committing transaction
+VersionStamp = Tuple[int, datetime]
+
+class DataVersionState:
+    """In-memory copy of the persisted data version, so most conditional requests skip the database"""
+
+    def __init__(self, refresh_seconds: float = DATA_VERSION_REFRESH_SECONDS):
+        self.version = 0
+        self.updated_at: Optional[datetime] = None
+        self.refresh_seconds = refresh_seconds
+        self.checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def update(self, version: int, updated_at: Optional[datetime]) -> bool:
+        """Make version current unless a newer one already is, returning whether it advanced"""
+        with self._lock:
+            # Batches committed concurrently may publish out of order
+            advanced = version > self.version
+            if version >= self.version:
+                self.version = version
+                self.updated_at = updated_at
+            return advanced
+
+    def stale(self) -> bool:
+        """Whether the persisted version is due to be read again"""
+        with self._lock:
+            return self.checked_at is None or time.monotonic() - self.checked_at >= self.refresh_seconds
+
+    def checked(self) -> None:
+        with self._lock:
+            self.checked_at = time.monotonic()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.version = 0
+            self.updated_at = None
+            self.checked_at = None
+
+    def headers(self) -> Dict[str, str]:
+        """ETag and Last-Modified of responses computed from the current data"""
+        with self._lock:
+            headers = {'ETag': f'"v{self.version}"', 'Cache-Control': 'no-cache'}
+            if self.updated_at is not None:
+                headers['Last-Modified'] = format_datetime(self.updated_at.replace(tzinfo=timezone.utc), usegmt=True)
+            return headers
+
+    def not_modified(self, if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """Whether a client holding these validators already has the current data"""
+        headers = self.headers()
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+            return '*' in tags or headers['ETag'] in tags
+
+        if if_modified_since is not None and self.updated_at is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            return self.updated_at.replace(tzinfo=timezone.utc) <= since
+
+        return False
+
+# Version of the data behind the metrics endpoints in this process
+data_version = DataVersionState()
+
+def bump_data_version(db: Session) -> VersionStamp:
+    """Increment the persisted version within the caller's transaction
+
+    One upsert, so the first bumps on a fresh database can't collide creating
+    the row. Pass the result to publish_data_version once the transaction has
+    committed.
+    """
+    updated_at = datetime.utcnow().replace(microsecond=0)
+    # Both dialects spell the upsert the same way
+    dialect = sqlite if db.get_bind().dialect.name == 'sqlite' else postgresql
+    statement = dialect.insert(DataVersion).values(id=1, version=1, updated_at=updated_at)
+    row = db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[DataVersion.id],
+            set_={'version': DataVersion.version + 1, 'updated_at': statement.excluded.updated_at}
+        ).returning(DataVersion.version, DataVersion.updated_at)
+    ).one()
+    return row[0], row[1]
+
+def publish_data_version(stamp: VersionStamp) -> None:
+    """Make a committed version current and drop metrics cached from older data"""
+    data_version.update(*stamp)
+    metrics_cache.invalidate()
+
+async def load_data_version(db: AsyncSession) -> None:
+    """Read the persisted version, dropping cached metrics if another process committed changes"""
+    row = (await db.execute(select(DataVersion.version, DataVersion.updated_at).where(DataVersion.id == 1))).first()
+    if data_version.update(*(row or (0, None))):
+        metrics_cache.invalidate()
+    data_version.checked()
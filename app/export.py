@@ -0,0 +1,120 @@
+"""
+Streaming encoders for the export endpoints and streamed metrics responses.
+
+Rows are fetched through a server-side cursor in partitions of
+EXPORT_BATCH_ROWS, each partition is encoded as one Arrow record batch
+(one Parquet row group) and the encoded bytes are yielded before the next
+partition is fetched, so a result set is never held in memory as a whole.
+stream_json applies the same partitioning to streamed metrics responses.
+"""
+
+import io
+import os
+from typing import AsyncIterator, List, Sequence
+from fastapi.concurrency import run_in_threadpool
+from pydantic_core import to_json
+from sqlalchemy.ext.asyncio import AsyncSession
+from .schemas import ExportFormat, JSONStreamFormat
+
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+JSON_MEDIA_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+}
+
+class ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last drain
+
+    Keeps counting positions across drains, which the Parquet footer offsets rely on.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def open_writer(sink: ChunkSink, schema, fmt: ExportFormat):
+    """Record batch writer of the requested format over sink"""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    if fmt == 'parquet':
+        return pq.ParquetWriter(sink, schema)
+    if fmt == 'arrow':
+        return pa.ipc.new_stream(sink, schema)
+    return pa_csv.CSVWriter(sink, schema)
+
+def encode_rows(writer, sink: ChunkSink, schema, rows: Sequence[Sequence]) -> bytes:
+    import pyarrow as pa
+
+    columns = list(zip(*rows))
+    writer.write_batch(pa.record_batch(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    ))
+    return sink.drain()
+
+def close_writer(writer, sink: ChunkSink) -> bytes:
+    writer.close()
+    return sink.drain()
+
+async def stream_export(db: AsyncSession, query, schema, fmt: ExportFormat) -> AsyncIterator[bytes]:
+    """Encode the rows of query as fmt, one partition of EXPORT_BATCH_ROWS at a time"""
+    sink = ChunkSink()
+    writer = open_writer(sink, schema, fmt)
+
+    result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+    async for rows in result.partitions():
+        # Encoding is CPU work, keep it off the event loop
+        yield await run_in_threadpool(encode_rows, writer, sink, schema, rows)
+
+    # Headers, footers and end-of-stream markers; also covers empty results
+    yield await run_in_threadpool(close_writer, writer, sink)
+
+async def stream_json(db: AsyncSession, query, fmt: JSONStreamFormat) -> AsyncIterator[bytes]:
+    """Serialize the rows of query as a JSON array or NDJSON, keyed by column label
+
+    Rows go straight from the cursor to pydantic-core's serializer, without
+    building and re-validating response models.
+    """
+    result = await db.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS))
+    keys = list(result.keys())
+    first = True
+
+    if fmt == 'json':
+        yield b'['
+    async for rows in result.partitions():
+        records = [dict(zip(keys, row)) for row in rows]
+        if fmt == 'ndjson':
+            yield b''.join(to_json(record) + b'\n' for record in records)
+        else:
+            # Drop the brackets of each partition's array and join them with commas
+            yield (b'' if first else b',') + to_json(records)[1:-1]
+        first = False
+    if fmt == 'json':
+        yield b']'
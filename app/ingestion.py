@@ -0,0 +1,300 @@
+import uuid
+from collections import Counter
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi.concurrency import run_in_threadpool
+from .compression import open_decompressed
+from .csv_processor import CSVProcessor, EMPLOYEE_PARSE_WORKERS, REFERENCE_REJECT_REASONS
+from .data_version import bump_data_version, publish_data_version
+from .ledger import check_upload, record_upload
+from .models import Department, Job, Employee, UploadLedger
+from .reference_index import reference_index
+from .rejects import ErrorSummary, RejectsFile
+from .schemas import EMPLOYEE_COLUMNS, BatchUploadResponse, ReferenceUploadMode, UploadCompression, UploadFormat
+from .timing import timed
+
+# Called after each written batch with (rows_parsed, inserted, skipped, errors)
+ProgressCallback = Callable[[int, int, int, list], None]
+
+def load_reference_data(
+    db: Session,
+    model,
+    name_column: str,
+    employee_fk,
+    records: List[Dict[str, Any]],
+    mode: ReferenceUploadMode = 'skip'
+) -> Tuple[int, int, int, int, List[str]]:
+    """Bulk load (id, name) reference rows, returning (inserted, updated, skipped, deleted, errors)
+
+    Existing rows are prefetched in one query; new rows are inserted and changed
+    names updated with one executemany each. mode decides what happens to ids
+    that already exist with a different name:
+      skip     keep the stored name
+      update   overwrite it with the uploaded name
+      replace  like update, and also delete ids missing from the upload
+               (ids still referenced by employees are kept and reported)
+    """
+    with timed('write'):
+        id_column = model.__table__.c.id
+        name = model.__table__.c[name_column]
+        incoming = {record['id']: record[name_column] for record in records}
+
+        existing_query = select(id_column, name)
+        if mode != 'replace':
+            existing_query = existing_query.where(id_column.in_(incoming.keys()))
+        existing = dict(db.execute(existing_query).all())
+
+        new_rows = [{'id': key, name_column: value} for key, value in incoming.items() if key not in existing]
+        changed_rows = [
+            {'id': key, name_column: value}
+            for key, value in incoming.items()
+            if key in existing and existing[key] != value
+        ]
+        if mode == 'skip':
+            changed_rows = []
+
+        if new_rows:
+            db.execute(insert(model), new_rows)
+        if changed_rows:
+            db.execute(update(model), changed_rows)
+
+        deleted_count = 0
+        deletable_ids = set()
+        errors = []
+        if mode == 'replace':
+            stale_ids = existing.keys() - incoming.keys()
+            referenced_ids = set(db.scalars(
+                select(employee_fk).where(employee_fk.in_(stale_ids)).distinct()
+            )) if stale_ids else set()
+
+            errors.extend(
+                f"{model.__name__} {stale_id} is referenced by employees and was not removed"
+                for stale_id in sorted(referenced_ids)
+            )
+            deletable_ids = stale_ids - referenced_ids
+            if deletable_ids:
+                deleted_count = db.execute(delete(model).where(id_column.in_(deletable_ids))).rowcount
+
+        stamp = bump_data_version(db) if new_rows or changed_rows or deleted_count else None
+    with timed('commit'):
+        db.commit()
+    if stamp:
+        publish_data_version(stamp)
+        reference_index.apply(model, added=(row['id'] for row in new_rows), removed=deletable_ids)
+
+    skipped_count = len(incoming) - len(new_rows) - len(changed_rows)
+    return len(new_rows), len(changed_rows), skipped_count, deleted_count, errors
+
+def read_reference_upload(
+    source: IO[bytes],
+    fmt: UploadFormat,
+    name_column: str,
+    process_csv: Callable[[bytes], List[Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """Parse a departments/jobs upload; columnar files skip text parsing"""
+    if fmt == 'csv':
+        with timed('read'):
+            content = source.read()
+        return process_csv(content)
+    return CSVProcessor.process_columnar_reference(source, fmt, name_column)
+
+def identical_upload_response(label: str, previous: UploadLedger) -> BatchUploadResponse:
+    return BatchUploadResponse(
+        message=f"{label} file identical to the last upload ({previous.created_at:%Y-%m-%d %H:%M:%S} UTC), nothing to load",
+        processed_rows=0,
+        unchanged_rows=previous.rows
+    )
+
+async def ingest_departments(
+    db: AsyncSession,
+    source: IO[bytes],
+    mode: ReferenceUploadMode = 'skip',
+    fmt: UploadFormat = 'csv',
+    force: bool = False,
+    compression: Optional[UploadCompression] = None
+) -> BatchUploadResponse:
+    """Load departments CSV, Parquet or Arrow IPC from a file object
+
+    A file identical to the last departments upload with the same mode is not loaded again, unless force.
+    Compressed CSV is compared as sent and decompressed while it is read.
+    """
+    digest, previous = await check_upload(db, source, 'departments', mode, force)
+    if previous is not None:
+        return identical_upload_response("Departments", previous)
+
+    departments_data = await run_in_threadpool(
+        read_reference_upload, open_decompressed(source, compression), fmt, 'department', CSVProcessor.process_departments_csv
+    )
+    inserted, updated, skipped, deleted, errors = await db.run_sync(
+        load_reference_data, Department, 'department', Employee.department_id, departments_data, mode
+    )
+    if not errors:
+        await db.run_sync(record_upload, 'departments', digest, inserted + updated + skipped, mode)
+    summary = ErrorSummary()
+    summary.add('still_referenced', errors)
+
+    return BatchUploadResponse(
+        message="Departments uploaded successfully",
+        processed_rows=inserted,
+        updated_rows=updated,
+        skipped_rows=skipped,
+        deleted_rows=deleted,
+        error_counts=dict(summary.counts),
+        errors=summary.samples
+    )
+
+async def ingest_jobs(
+    db: AsyncSession,
+    source: IO[bytes],
+    mode: ReferenceUploadMode = 'skip',
+    fmt: UploadFormat = 'csv',
+    force: bool = False,
+    compression: Optional[UploadCompression] = None
+) -> BatchUploadResponse:
+    """Load jobs CSV, Parquet or Arrow IPC from a file object
+
+    A file identical to the last jobs upload with the same mode is not loaded again, unless force.
+    Compressed CSV is compared as sent and decompressed while it is read.
+    """
+    digest, previous = await check_upload(db, source, 'jobs', mode, force)
+    if previous is not None:
+        return identical_upload_response("Jobs", previous)
+
+    jobs_data = await run_in_threadpool(
+        read_reference_upload, open_decompressed(source, compression), fmt, 'job', CSVProcessor.process_jobs_csv
+    )
+    inserted, updated, skipped, deleted, errors = await db.run_sync(
+        load_reference_data, Job, 'job', Employee.job_id, jobs_data, mode
+    )
+    if not errors:
+        await db.run_sync(record_upload, 'jobs', digest, inserted + updated + skipped, mode)
+    summary = ErrorSummary()
+    summary.add('still_referenced', errors)
+
+    return BatchUploadResponse(
+        message="Jobs uploaded successfully",
+        processed_rows=inserted,
+        updated_rows=updated,
+        skipped_rows=skipped,
+        deleted_rows=deleted,
+        error_counts=dict(summary.counts),
+        errors=summary.samples
+    )
+
+async def ingest_employees(
+    db: AsyncSession,
+    source: IO[bytes],
+    chunk_size: int = 1000,
+    on_progress: Optional[ProgressCallback] = None,
+    parse_workers: Optional[int] = None,
+    fmt: UploadFormat = 'csv',
+    force: bool = False,
+    compression: Optional[UploadCompression] = None,
+    upload_id: Optional[str] = None
+) -> BatchUploadResponse:
+    """Stream employees CSV from a file object, writing one batch per chunk
+
+    Reading and parsing run in the threadpool and writes go through the async
+    connection, so the event loop keeps serving other requests meanwhile. With
+    parse_workers > 1 (default EMPLOYEE_PARSE_WORKERS) parsing is spread over a
+    process pool while batches are still written one at a time in file order.
+    Parquet and Arrow IPC files are read record batch by record batch instead,
+    without text parsing. Rows failing validation, including references to
+    departments or jobs that don't exist (looked up in the database before the
+    rows are given up, and checked again when they are written), are counted
+    per reason in rejected_rows. They are written to the rejects file of
+    upload_id (a new id by default) along with the rows of batches the
+    database refused, counted in error_counts; the response only samples both.
+
+    Unless force, a file identical to the last employees upload that loaded
+    without errors or rejected rows is not parsed at all, and rows unchanged
+    since they were last uploaded never reach save_batch_to_db; both are
+    counted in unchanged_rows. Compressed CSV is hashed as sent and
+    decompressed block by block as the parser reads it.
+    """
+    digest, previous = await check_upload(db, source, 'employees', force=force)
+    if previous is not None:
+        return identical_upload_response("Employees", previous)
+
+    batch_count = 0
+    total_valid = 0
+    total_processed = 0
+    total_skipped = 0
+    total_unchanged = 0
+    errors = ErrorSummary()
+    rejected = Counter()
+    rejects = RejectsFile(upload_id or uuid.uuid4().hex)
+
+    reference = await reference_index.snapshot(db)
+    if fmt == 'csv':
+        batches = CSVProcessor.iter_employee_batches_parallel(
+            open_decompressed(source, compression), chunk_size, parse_workers or EMPLOYEE_PARSE_WORKERS,
+            reference=reference
+        )
+    else:
+        batches = CSVProcessor.iter_columnar_employee_batches(source, fmt, chunk_size, reference)
+    try:
+        while (batch := await run_in_threadpool(next, batches, None)) is not None:
+            if any(batch.attrs['rejected'].get(reason) for reason in REFERENCE_REJECT_REASONS):
+                batch = await db.run_sync(CSVProcessor.readmit_known_references, batch)
+                if batch.empty:
+                    await db.rollback()
+            rejected.update(batch.attrs['rejected'])
+            if 'rejects' in batch.attrs:
+                # Popped before anything copies the batch, along with its attrs
+                await run_in_threadpool(rejects.write, batch.attrs.pop('rejects'))
+            if batch.empty:
+                continue
+
+            parsed = len(batch)
+            total_valid += parsed
+            if not force:
+                batch, unchanged = await db.run_sync(CSVProcessor.drop_unchanged_rows, batch)
+                total_unchanged += unchanged
+                if batch.empty:
+                    # Nothing to write; don't keep the lookup's transaction open while parsing on
+                    await db.rollback()
+                    if on_progress:
+                        on_progress(parsed, 0, 0, [])
+                    continue
+
+            batch_count += 1
+            processed, skipped, batch_errors = await db.run_sync(CSVProcessor.save_batch_to_db, batch)
+            total_processed += processed
+            total_skipped += skipped
+            if 'refused' in batch.attrs:
+                # Their department or job was removed since the batch was validated
+                refused = batch.attrs.pop('refused')
+                rejected.update(Counter(refused['reason']))
+                await run_in_threadpool(rejects.write, refused)
+            if batch_errors and not processed and not skipped:
+                # The whole batch was rolled back
+                errors.add('database_error', batch_errors, count=len(batch))
+                refused = batch[EMPLOYEE_COLUMNS].assign(line=batch.index + 1, reason='database_error')
+                await run_in_threadpool(rejects.write, refused)
+            elif batch_errors:
+                errors.add('database_error', batch_errors)
+
+            if on_progress:
+                on_progress(parsed, processed, skipped, batch_errors)
+    finally:
+        await run_in_threadpool(rejects.close)
+
+    if not errors and not rejected:
+        # Rejected rows may load once their department or job exists, so the resend must be parsed
+        await db.run_sync(record_upload, 'employees', digest, total_valid)
+
+    return BatchUploadResponse(
+        message=f"Employees uploaded successfully in {batch_count} batches",
+        upload_id=rejects.upload_id,
+        processed_rows=total_processed,
+        skipped_rows=total_skipped,
+        unchanged_rows=total_unchanged,
+        rejected_rows=dict(rejected),
+        rejected_sample=rejects.sample,
+        rejects_url=rejects.url,
+        error_counts=dict(errors.counts),
+        errors=errors.samples
+    )
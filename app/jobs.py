@@ -0,0 +1,197 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import IO, Awaitable, Callable, Optional
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from .rejects import UPLOAD_ERROR_SAMPLES
+from .schemas import BatchUploadResponse, JobStatusResponse
+
+logger = logging.getLogger(__name__)
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "2"))
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "globant_uploads"))
+JOB_HISTORY_LIMIT = int(os.getenv("JOB_HISTORY_LIMIT", "1000"))
+
+# Runs the ingestion of a spooled file: (session, file object, job) -> response
+JobRunner = Callable[[AsyncSession, IO[bytes], "IngestionJob"], Awaitable[BatchUploadResponse]]
+
+class IngestionJob:
+    """Progress of one background upload, updated by its worker"""
+
+    def __init__(self, kind: str, spool_path: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.spool_path = spool_path
+        self.status = "queued"
+        self.message: Optional[str] = None
+        self.rows_parsed = 0
+        self.inserted_rows = 0
+        self.skipped_rows = 0
+        self.unchanged_rows = 0
+        self.rejected_rows: dict = {}
+        self.rejected_sample: list = []
+        self.rejects_url: Optional[str] = None
+        self.error_counts: dict = {}
+        # The first UPLOAD_ERROR_SAMPLES messages; the result's error_counts has the totals
+        self.errors: list = []
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started = 0.0
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            self.status = "running"
+            self.started_at = datetime.utcnow()
+            self._started = time.perf_counter()
+
+    def record_batch(self, parsed: int, inserted: int, skipped: int, errors: list):
+        with self._lock:
+            self.rows_parsed += parsed
+            self.inserted_rows += inserted
+            self.skipped_rows += skipped
+            self.errors.extend(errors[:max(0, UPLOAD_ERROR_SAMPLES - len(self.errors))])
+            self._elapsed = time.perf_counter() - self._started
+
+    def finish(self, result: Optional[BatchUploadResponse] = None, error: Optional[str] = None):
+        with self._lock:
+            self.finished_at = datetime.utcnow()
+            self._elapsed = time.perf_counter() - self._started
+            if error is not None:
+                self.status = "failed"
+                self.message = error
+                return
+
+            self.status = "completed"
+            self.message = result.message
+            self.unchanged_rows = result.unchanged_rows
+            self.rejected_rows = dict(result.rejected_rows)
+            self.rejected_sample = list(result.rejected_sample)
+            self.rejects_url = result.rejects_url
+            self.error_counts = dict(result.error_counts)
+            # Uploads without per-batch progress only report once they finish
+            if not self.rows_parsed:
+                self.rows_parsed = result.processed_rows + result.updated_rows + result.skipped_rows
+                self.inserted_rows = result.processed_rows
+                self.skipped_rows = result.skipped_rows
+                self.errors = list(result.errors)
+
+    def snapshot(self) -> JobStatusResponse:
+        with self._lock:
+            return JobStatusResponse(
+                id=self.id,
+                kind=self.kind,
+                status=self.status,
+                message=self.message,
+                rows_parsed=self.rows_parsed,
+                inserted_rows=self.inserted_rows,
+                skipped_rows=self.skipped_rows,
+                unchanged_rows=self.unchanged_rows,
+                rejected_rows=dict(self.rejected_rows),
+                rejected_sample=list(self.rejected_sample),
+                rejects_url=self.rejects_url,
+                error_counts=dict(self.error_counts),
+                errors=list(self.errors),
+                rows_per_second=self.rows_parsed / self._elapsed if self._elapsed else 0.0,
+                created_at=self.created_at,
+                started_at=self.started_at,
+                finished_at=self.finished_at
+            )
+
+class JobManager:
+    """In-process queue of spooled uploads consumed by asyncio worker tasks
+
+    Workers run on the application's event loop (see start/stop in the app
+    lifespan); ingestion itself offloads parsing to the threadpool.
+    """
+
+    def __init__(self, max_workers: int = INGESTION_WORKERS, spool_dir: str = UPLOAD_SPOOL_DIR,
+                 history_limit: int = JOB_HISTORY_LIMIT):
+        self.max_workers = max_workers
+        self.spool_dir = spool_dir
+        self.history_limit = history_limit
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the queue and worker tasks on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"ingestion-{i}") for i in range(self.max_workers)
+        ]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def submit(self, kind: str, source: IO[bytes], suffix: str,
+                     session_factory: Callable[[], AsyncSession], runner: JobRunner) -> IngestionJob:
+        """Spool the upload to local disk and queue it for a background worker"""
+        if self._queue is None:
+            raise RuntimeError("Job manager is not running")
+
+        spool_path = await run_in_threadpool(self._spool, kind, source, suffix)
+
+        job = IngestionJob(kind, spool_path)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+
+        self._queue.put_nowait((job, session_factory, runner))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _spool(self, kind: str, source: IO[bytes], suffix: str) -> str:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        fd, spool_path = tempfile.mkstemp(prefix=f"{kind}-", suffix=suffix, dir=self.spool_dir)
+        with os.fdopen(fd, "wb") as spool:
+            shutil.copyfileobj(source, spool)
+        return spool_path
+
+    async def _worker(self):
+        while True:
+            job, session_factory, runner = await self._queue.get()
+            try:
+                await self._run(job, session_factory, runner)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestionJob, session_factory: Callable[[], AsyncSession], runner: JobRunner):
+        job.start()
+        async with session_factory() as db:
+            try:
+                with open(job.spool_path, "rb") as source:
+                    result = await runner(db, source, job)
+                job.finish(result)
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Error running {job.kind} ingestion job {job.id}: {e}")
+                job.finish(error=str(e))
+            finally:
+                os.remove(job.spool_path)
+
+    def _prune(self):
+        # Forget the oldest finished jobs once the history limit is reached
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_limit)]:
+            del self._jobs[job_id]
+
+job_manager = JobManager()
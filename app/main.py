@@ -1,22 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import logging
-from .database import engine, Base
 from .routes.upload import router as upload_router
 from .routes.metrics import router as metrics_router
-
-# Create database tables
-Base.metadata.create_all(bind=engine)
+from .routes.jobs import router as jobs_router
+from .routes.export import router as export_router
+from .jobs import job_manager
+from .compression import DecompressRequestMiddleware
+from .timing import RequestTimingMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background ingestion workers for the lifetime of the app"""
+    job_manager.start()
+    yield
+    await job_manager.stop()
+
 # Create FastAPI app
 app = FastAPI(
     title="Globant Data Engineering Challenge API",
     description="REST API for processing employee data and generating hiring metrics",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -26,8 +36,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Inflate request bodies sent with Content-Encoding: gzip before they are parsed
+app.add_middleware(DecompressRequestMiddleware)
+
+# Server-Timing header and timing log line for every request, ?profile=1 when REQUEST_PROFILING is on
+app.add_middleware(RequestTimingMiddleware)
+
 # Include routers
 app.include_router(
     upload_router,
@@ -41,6 +58,18 @@ app.include_router(
     tags=["Metrics"]
 )
 
+app.include_router(
+    jobs_router,
+    prefix="/api/v1",
+    tags=["Jobs"]
+)
+
+app.include_router(
+    export_router,
+    prefix="/api/v1",
+    tags=["Export"]
+)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -0,0 +1,63 @@
+"""
+Schema migration: create the tables declared in app/models.py.
+
+The API no longer touches the schema when it is imported, so it starts
+without a database round trip. The Docker image runs this before starting
+the API; elsewhere, run it before serving and again after models gain
+tables (existing tables are left as they are):
+
+    python -m app.migrate           # create missing tables
+    python -m app.migrate check     # exit 1 if tables are missing
+"""
+
+import sys
+import logging
+from typing import List, Union
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_LOCK_KEY = 0x6d696772
+
+def missing_tables(bind: Union[Engine, Connection]) -> List[str]:
+    """Tables of the models not present in the database"""
+    existing = set(inspect(bind).get_table_names())
+    return [table.name for table in Base.metadata.sorted_tables if table.name not in existing]
+
+def create_schema(engine: Engine) -> List[str]:
+    """Create the missing tables (with their indexes and the default employees partition), returning their names"""
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            # Every API container migrates on start; replicas starting together take turns
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        missing = missing_tables(conn)
+        Base.metadata.create_all(bind=conn)
+    return missing
+
+def main(argv: List[str]) -> int:
+    from .database import engine
+
+    if len(argv) > 1 or (argv and argv[0] not in ('create', 'check')):
+        print("Usage: python -m app.migrate [create | check]")
+        return 2
+
+    try:
+        if argv and argv[0] == 'check':
+            missing = missing_tables(engine)
+            if missing:
+                print(f"Missing tables: {', '.join(missing)}")
+                return 1
+            print("Schema is up to date")
+            return 0
+
+        created = create_schema(engine)
+        logger.info("Created tables: %s", ', '.join(created) if created else "none, schema is up to date")
+        return 0
+    finally:
+        engine.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Index, DDL, event, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -22,13 +22,83 @@ class Job(Base):
     employees = relationship("Employee", back_populates="job_rel")
 
 class Employee(Base):
+    """Hires, range-partitioned by hire year on PostgreSQL (see app/partitions.py)"""
     __tablename__ = "employees"
 
+    # The partition key has to be part of the primary key; ids stay unique
+    # because ingestion merges batches one at a time, skipping existing ids
+    # (see EMPLOYEES_MERGE_LOCK_KEY in app/csv_processor.py)
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
-    datetime = Column(DateTime, nullable=False)
+    datetime = Column(DateTime, primary_key=True, nullable=False)
     department_id = Column(Integer, ForeignKey("departments.id"), nullable=True)
     job_id = Column(Integer, ForeignKey("jobs.id"), nullable=True)
 
     department_rel = relationship("Department", back_populates="employees")
     job_rel = relationship("Job", back_populates="employees")
+
+    __table_args__ = (
+        # Covers hire-date range scans that group by department and job
+        Index("idx_employee_datetime", "datetime", postgresql_include=["department_id", "job_id"]),
+        Index("idx_employee_dept_job", "department_id", "job_id"),
+        Index("idx_employee_job", "job_id"),
+        {"postgresql_partition_by": "RANGE (datetime)"},
+    )
+    __mapper_args__ = {"primary_key": [id]}
+
+# Rows of years without a partition land here until ingestion creates one
+event.listen(
+    Employee.__table__,
+    "after_create",
+    DDL("CREATE TABLE IF NOT EXISTS employees_default PARTITION OF employees DEFAULT").execute_if(dialect="postgresql")
+)
+
+class HiringRollup(Base):
+    """Hires per (year, quarter, department, job), maintained on ingest"""
+    __tablename__ = "hiring_rollup"
+
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer, nullable=False)
+    quarter = Column(Integer, nullable=False)
+    department_id = Column(Integer, nullable=True)
+    job_id = Column(Integer, nullable=True)
+    hired = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Employees without a department or job still get a single bucket
+        Index(
+            "uq_hiring_rollup_bucket", "year", "quarter", "department_id", "job_id",
+            unique=True, postgresql_nulls_not_distinct=True
+        ),
+    )
+
+class DataVersion(Base):
+    """Single row counting committed changes to employees, departments and jobs"""
+    __tablename__ = "data_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+class UploadLedger(Base):
+    """Content hash of every completed upload, see app/ledger.py"""
+    __tablename__ = "upload_ledger"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    mode = Column(String, nullable=True)
+    content_hash = Column(String(64), nullable=False)
+    rows = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Latest upload of each kind
+        Index("idx_upload_ledger_kind", "kind", "id"),
+    )
+
+class EmployeeFingerprint(Base):
+    """Hash of each employee row as last uploaded, so resent rows can be skipped"""
+    __tablename__ = "employee_fingerprints"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(BigInteger, nullable=False)
@@ -0,0 +1,150 @@
+"""
+Yearly range partitions of the employees table (PostgreSQL).
+
+Employee batches create the partitions of the hire years they contain (see
+CSVProcessor.copy_batch_to_db); rows of other years sit in employees_default.
+Every batch looks its years up in the catalog rather than trusting what the
+process saw before, since other workers or the CLI may have detached them.
+Run as a module to list partitions, create them ahead of time, or detach an
+old year into a standalone table (renamed employees_y<year>_detached_<time>,
+so a later upload of that year gets a new partition) that can be archived or
+dropped. The year's rollup buckets and row fingerprints go with it, so
+metrics stop reporting it and a later upload of its rows loads them again:
+
+    python -m app.partitions list
+    python -m app.partitions create <year> [<year> ...]
+    python -m app.partitions detach <year>
+"""
+
+import sys
+import logging
+from datetime import datetime
+from typing import Iterable, List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .data_version import bump_data_version, publish_data_version
+from .rollup import year_range
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PARTITION = "employees_default"
+
+# Serializes partition maintenance across concurrent ingestion transactions
+PARTITION_LOCK_KEY = 0x656d706c
+
+YEAR_PARTITIONS_SQL = """
+    SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent = 'employees'::regclass AND c.relname <> :default
+    ORDER BY c.relname
+"""
+
+def partition_name(year: int) -> str:
+    return f"employees_y{int(year)}"
+
+def year_partitions(db: Session) -> List[str]:
+    """Names of the yearly partitions currently attached to employees"""
+    return list(db.execute(text(YEAR_PARTITIONS_SQL), {"default": DEFAULT_PARTITION}).scalars())
+
+def create_year_partition(db: Session, year: int) -> None:
+    """Attach a partition for year, moving its rows out of the default partition
+
+    Attaching (rather than CREATE ... PARTITION OF) works even when the default
+    partition already holds rows of that year.
+    """
+    name = partition_name(year)
+    if db.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is not None:
+        raise ValueError(f"Table {name} exists but is not a partition of employees; rename or drop it")
+
+    start, end = year_range(year)
+    db.execute(text(f"CREATE TABLE {name} (LIKE employees INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    db.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE datetime >= :start AND datetime < :end RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """), {"start": start, "end": end})
+    db.execute(text(
+        f"ALTER TABLE employees ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    ))
+    logger.info(f"Created employees partition {name}")
+
+def ensure_year_partitions(db: Session, years: Iterable[int]) -> List[int]:
+    """Create missing partitions for years within the current transaction, returning their years
+
+    The lookup is one catalog query; the advisory lock is only taken, and the
+    catalog read again under it, when a year is missing. The lock on employees
+    (which the batch's insert takes anyway) is taken first, so a concurrent
+    detach waits for the batch instead of happening between lookup and insert.
+    """
+    years = sorted({int(year) for year in years})
+    db.execute(text("LOCK TABLE employees IN ROW EXCLUSIVE MODE"))
+    existing = set(year_partitions(db))
+    if all(partition_name(year) in existing for year in years):
+        return []
+
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PARTITION_LOCK_KEY})
+    existing = set(year_partitions(db))
+    created = [year for year in years if partition_name(year) not in existing]
+    for year in created:
+        create_year_partition(db, year)
+    return created
+
+def detach_year_partition(db: Session, year: int) -> str:
+    """Detach the partition of year into a standalone table, returning the table's new name
+
+    The table is renamed so the year's name is free for the partition a later
+    upload creates. The year's hiring_rollup buckets and the fingerprints of
+    its rows are deleted in the same transaction, so `python -m app.rollup
+    check` stays clean and resending the rows loads them instead of counting
+    them as unchanged.
+    """
+    name = partition_name(year)
+    # Waits for batches in flight, which look their partitions up under a weaker lock
+    db.execute(text("LOCK TABLE employees IN ACCESS EXCLUSIVE MODE"))
+    if name not in year_partitions(db):
+        db.rollback()
+        raise ValueError(f"No employees partition for {year}")
+
+    detached = f"{name}_detached_{datetime.utcnow():%Y%m%d%H%M%S}"
+    db.execute(text(f"ALTER TABLE employees DETACH PARTITION {name}"))
+    db.execute(text(f"ALTER TABLE {name} RENAME TO {detached}"))
+    db.execute(text(f"DELETE FROM employee_fingerprints f USING {detached} d WHERE f.id = d.id"))
+    db.execute(text("DELETE FROM hiring_rollup WHERE year = :year"), {"year": int(year)})
+    stamp = bump_data_version(db)
+    db.commit()
+    publish_data_version(stamp)
+    return detached
+
+def main(argv: List[str]) -> int:
+    from .database import SessionLocal
+
+    if not argv or argv[0] not in ('list', 'create', 'detach') or not all(a.isdigit() for a in argv[1:]) \
+            or (argv[0] == 'list') != (len(argv) == 1) or (argv[0] == 'detach' and len(argv) != 2):
+        print("Usage: python -m app.partitions [list | create <year>... | detach <year>]")
+        return 2
+
+    db = SessionLocal()
+    try:
+        if argv[0] == 'list':
+            for name in year_partitions(db):
+                print(name)
+            return 0
+
+        if argv[0] == 'create':
+            ensure_year_partitions(db, map(int, argv[1:]))
+            db.commit()
+            return 0
+
+        try:
+            print(f"Detached {detach_year_partition(db, int(argv[1]))}")
+        except ValueError as e:
+            print(e)
+            return 1
+        return 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,87 @@
+import bisect
+import threading
+import time
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds (ms) of the checkout latency histogram buckets; the last bucket is +Inf
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class PoolStats:
+    """Thread-safe checkout counters and latency histogram of one connection pool"""
+
+    def __init__(self, buckets_ms: tuple = CHECKOUT_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.checkout_seconds = 0.0
+        self._bucket_counts = [0] * (len(buckets_ms) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, waited: bool, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.checkout_seconds += seconds
+                self._bucket_counts[bisect.bisect_left(self.buckets_ms, seconds * 1000)] += 1
+            if waited:
+                self.waits += 1
+                self.wait_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            # Cumulative counts per upper bound, like a Prometheus histogram
+            histogram = {}
+            running = 0
+            for bound, count in zip((*map(str, self.buckets_ms), '+Inf'), self._bucket_counts):
+                running += count
+                histogram[bound] = running
+
+            return {
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'timeouts': self.timeouts,
+                'wait_seconds': self.wait_seconds,
+                'checkout_seconds': self.checkout_seconds,
+                'checkout_latency_ms': histogram
+            }
+
+class InstrumentedPoolMixin:
+    """Times every checkout of a QueuePool and counts the ones that had to wait"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        # At capacity with nothing idle, the checkout blocks for up to the pool timeout
+        waited = self.checkedin() == 0 and self._max_overflow > -1 and self.overflow() >= self._max_overflow
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.stats.record(time.perf_counter() - start, waited, timed_out=True)
+            raise
+        self.stats.record(time.perf_counter() - start, waited)
+        return connection
+
+    def report(self) -> dict:
+        """Current occupancy of the pool together with its checkout statistics"""
+        return {
+            'pool_size': self.size(),
+            'max_overflow': self._max_overflow,
+            'checked_in': self.checkedin(),
+            'checked_out': self.checkedout(),
+            'overflow': max(self.overflow(), 0),
+            **self.stats.snapshot()
+        }
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
@@ -0,0 +1,80 @@
+"""
+In-memory index of the department and job ids employees may reference.
+
+Employee batches are checked against it with one vectorized isin per column
+(see CSVProcessor.clean_employees_frame) instead of leaving unknown ids to the
+database. It is loaded on the first employees upload of the process and kept
+current by the departments/jobs uploads once they commit. Ids it doesn't know
+are looked up in the database before their rows are rejected, which picks up
+departments and jobs added by other workers or loaded directly (see
+CSVProcessor.readmit_known_references). The merge into employees still checks
+references, which covers ids removed meanwhile by another process.
+"""
+
+import threading
+from typing import Iterable, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import Department, Job
+
+class ReferenceIds(NamedTuple):
+    """Immutable snapshot of the index, cheap to send to parse worker processes"""
+    department_ids: np.ndarray
+    job_ids: np.ndarray
+
+class ReferenceIndex:
+    def __init__(self):
+        self._ids: Optional[ReferenceIds] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._ids is not None
+
+    def load(self, db: Session) -> ReferenceIds:
+        """(Re)load every department and job id"""
+        ids = ReferenceIds(
+            np.fromiter(db.scalars(select(Department.id)), dtype=np.int64),
+            np.fromiter(db.scalars(select(Job.id)), dtype=np.int64)
+        )
+        with self._lock:
+            self._ids = ids
+        return ids
+
+    async def snapshot(self, db: AsyncSession) -> ReferenceIds:
+        """Current ids, loading them through db the first time"""
+        ids = self._ids
+        if ids is None:
+            ids = await db.run_sync(self.load)
+        return ids
+
+    def refresh(self, db: Session, department_ids: np.ndarray, job_ids: np.ndarray) -> ReferenceIds:
+        """Current ids, after looking up which of the given ids missing from the index exist now"""
+        ids = self._ids
+        if ids is None:
+            return self.load(db)
+
+        for model, known, wanted in ((Department, ids.department_ids, department_ids), (Job, ids.job_ids, job_ids)):
+            missing = np.setdiff1d(wanted, known)
+            if missing.size:
+                self.apply(model, added=db.scalars(select(model.id).where(model.id.in_(missing.tolist()))))
+        return self._ids
+
+    def apply(self, model, added: Iterable[int] = (), removed: Iterable[int] = ()) -> None:
+        """Record committed changes to departments or jobs; a no-op until the index is loaded"""
+        with self._lock:
+            if self._ids is None:
+                return
+            field = 'department_ids' if model is Department else 'job_ids'
+            ids = getattr(self._ids, field)
+            ids = np.union1d(ids, np.fromiter(added, dtype=np.int64))
+            ids = np.setdiff1d(ids, np.fromiter(removed, dtype=np.int64))
+            self._ids = self._ids._replace(**{field: ids})
+
+    def reset(self) -> None:
+        with self._lock:
+            self._ids = None
+
+reference_index = ReferenceIndex()
@@ -0,0 +1,131 @@
+"""
+Bounded error reporting for uploads, and the rejects file of each employees upload.
+
+Responses count errors per category and only carry the first
+UPLOAD_ERROR_SAMPLES messages and rejected rows. Every rejected row (the
+validation rejects counted in rejected_rows, and the rows of batches the
+database refused) is appended meanwhile to a CSV file under
+UPLOAD_REJECTS_DIR with its line number, reason and values as uploaded,
+served by GET /api/v1/uploads/{upload_id}/rejects. The file is written as
+<upload_id>.csv.part and renamed once the upload ends, and files older than
+UPLOAD_REJECTS_RETENTION seconds are removed whenever a new one is started.
+"""
+
+import os
+import re
+import tempfile
+import time
+from collections import Counter
+from typing import TYPE_CHECKING, List, Optional
+from .schemas import EMPLOYEE_COLUMNS
+from .timing import timed
+
+if TYPE_CHECKING:
+    # Only rejects files handle frames; the API imports pandas on its first upload
+    import pandas as pd
+
+UPLOAD_REJECTS_DIR = os.getenv("UPLOAD_REJECTS_DIR", os.path.join(tempfile.gettempdir(), "globant_rejects"))
+UPLOAD_REJECTS_RETENTION = int(os.getenv("UPLOAD_REJECTS_RETENTION", "86400"))
+
+# Error messages and rejected rows included in upload responses and job status
+UPLOAD_ERROR_SAMPLES = int(os.getenv("UPLOAD_ERROR_SAMPLES", "20"))
+
+REJECTS_COLUMNS = ['line', 'reason'] + EMPLOYEE_COLUMNS
+
+# Upload ids are uuid4 hex strings, which also keeps them from naming other paths
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+class ErrorSummary:
+    """Error messages counted per category, keeping only the first few as samples"""
+
+    def __init__(self, sample_size: int = UPLOAD_ERROR_SAMPLES):
+        self.sample_size = sample_size
+        self.counts: Counter = Counter()
+        self.samples: List[str] = []
+
+    def add(self, category: str, messages: List[str], count: Optional[int] = None) -> None:
+        """Count count (default: one per message) errors of category and sample their messages"""
+        count = len(messages) if count is None else count
+        if count:
+            self.counts[category] += count
+        self.samples.extend(messages[:max(0, self.sample_size - len(self.samples))])
+
+    def __bool__(self) -> bool:
+        return bool(self.counts)
+
+class RejectsFile:
+    """Rejected rows of one employees upload, appended to UPLOAD_REJECTS_DIR/<upload_id>.csv
+
+    The file is only created once a row is rejected. Rows are written as they
+    come, so memory stays bounded by one batch whatever the number of rejects.
+    """
+
+    def __init__(self, upload_id: str, directory: str = UPLOAD_REJECTS_DIR,
+                 sample_size: int = UPLOAD_ERROR_SAMPLES):
+        self.upload_id = upload_id
+        self.directory = directory
+        self.path = os.path.join(directory, f"{upload_id}.csv")
+        self.sample_size = sample_size
+        self.rows = 0
+        self.sample: List[dict] = []
+        self._file = None
+
+    @property
+    def url(self) -> Optional[str]:
+        return f"/api/v1/uploads/{self.upload_id}/rejects" if self.rows else None
+
+    def write(self, rejects: 'pd.DataFrame') -> None:
+        """Append rows with REJECTS_COLUMNS"""
+        import pandas as pd
+
+        if rejects.empty:
+            return
+
+        with timed('rejects'):
+            if self._file is None:
+                prune_rejects(self.directory)
+                os.makedirs(self.directory, exist_ok=True)
+                self._file = open(f"{self.path}.part", 'w', newline='')
+                self._file.write(','.join(REJECTS_COLUMNS) + '\n')
+            rejects.to_csv(self._file, header=False, index=False, columns=REJECTS_COLUMNS)
+
+        self.rows += len(rejects)
+        missing = self.sample_size - len(self.sample)
+        if missing > 0:
+            self.sample.extend(
+                {
+                    'line': int(row['line']),
+                    'reason': row['reason'],
+                    'values': {column: None if pd.isna(row[column]) else str(row[column]) for column in EMPLOYEE_COLUMNS}
+                }
+                for row in rejects.head(missing).to_dict('records')
+            )
+
+    def close(self) -> None:
+        """Finish the file and make it available for download"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.replace(f"{self.path}.part", self.path)
+
+def prune_rejects(directory: str = UPLOAD_REJECTS_DIR, retention: int = UPLOAD_REJECTS_RETENTION) -> None:
+    """Remove rejects files last written more than retention seconds ago"""
+    cutoff = time.time() - retention
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Removed meanwhile by another worker
+            pass
+
+def rejects_path(upload_id: str, directory: str = UPLOAD_REJECTS_DIR) -> Optional[str]:
+    """Path of a finished upload's rejects file, None if it has none or it expired"""
+    if not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+        return None
+    path = os.path.join(directory, f"{upload_id}.csv")
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,163 @@
+"""
+Maintenance of the hiring_rollup summary table.
+
+Employee batches increment the rollup as they are written (see
+CSVProcessor.save_batch_to_db). Run as a module to rebuild the rollup from
+raw employees or to compare both:
+
+    python -m app.rollup rebuild [year]
+    python -m app.rollup check [year]
+"""
+
+import sys
+import logging
+from datetime import datetime
+from typing import Counter, List, Dict, Any, Tuple, Optional
+from sqlalchemy import Integer, cast, func, extract, select, text
+from sqlalchemy.orm import Session
+from .data_version import bump_data_version, publish_data_version
+from .models import Employee, HiringRollup
+
+logger = logging.getLogger(__name__)
+
+# (year, quarter, department_id, job_id)
+RollupKey = Tuple[int, int, Optional[int], Optional[int]]
+
+# Increments the rollup from the rows of an `inserted` CTE holding
+# (datetime, department_id, job_id) of newly written employees
+ROLLUP_INCREMENT_SQL = """
+    INSERT INTO hiring_rollup (year, quarter, department_id, job_id, hired)
+    SELECT extract(year FROM datetime)::int, extract(quarter FROM datetime)::int,
+           department_id, job_id, count(*)
+    FROM inserted
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (year, quarter, department_id, job_id)
+    DO UPDATE SET hired = hiring_rollup.hired + EXCLUDED.hired
+"""
+
+def add_hires(db: Session, hires: Counter[RollupKey]) -> None:
+    """Increment rollup buckets by the given counts (dialect-neutral ORM path)"""
+    for (year, quarter, department_id, job_id), hired in hires.items():
+        bucket = db.query(HiringRollup).filter(
+            HiringRollup.year == year,
+            HiringRollup.quarter == quarter,
+            HiringRollup.department_id.is_(department_id) if department_id is None
+            else HiringRollup.department_id == department_id,
+            HiringRollup.job_id.is_(job_id) if job_id is None
+            else HiringRollup.job_id == job_id
+        ).first()
+
+        if bucket:
+            bucket.hired += hired
+        else:
+            db.add(HiringRollup(
+                year=year, quarter=quarter, department_id=department_id, job_id=job_id, hired=hired
+            ))
+
+def year_range(year: int) -> Tuple[datetime, datetime]:
+    """Half-open [start, end) hire-date bounds of a calendar year"""
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+def raw_hires_query(year: Optional[int] = None):
+    """Hires per rollup bucket computed from the employees table
+
+    Filters on a plain datetime range so the scan is pruned to that year's
+    partition and idx_employee_datetime can be used, and groups by the
+    truncated quarter rather than extracting per row.
+    """
+    quarter_start = func.date_trunc('quarter', Employee.datetime)
+
+    query = select(
+        cast(extract('year', quarter_start), Integer).label('year'),
+        cast(extract('quarter', quarter_start), Integer).label('quarter'),
+        Employee.department_id,
+        Employee.job_id,
+        func.count().label('hired')
+    ).group_by(
+        quarter_start, Employee.department_id, Employee.job_id
+    )
+
+    if year is not None:
+        start, end = year_range(year)
+        query = query.where(Employee.datetime >= start, Employee.datetime < end)
+
+    return query
+
+def rebuild_rollup(db: Session, year: Optional[int] = None) -> int:
+    """Regenerate the rollup (or one year of it) from raw employees, returning the number of buckets"""
+    if db.get_bind().dialect.name == 'postgresql':
+        # Block concurrent ingestion so no batch is counted twice or missed
+        db.execute(text("LOCK TABLE employees IN SHARE MODE"))
+
+    buckets = db.query(HiringRollup)
+    if year is not None:
+        buckets = buckets.filter(HiringRollup.year == year)
+    buckets.delete()
+
+    raw = raw_hires_query(year).subquery()
+    db.execute(
+        HiringRollup.__table__.insert().from_select(
+            ['year', 'quarter', 'department_id', 'job_id', 'hired'],
+            select(raw.c.year, raw.c.quarter, raw.c.department_id, raw.c.job_id, raw.c.hired)
+        )
+    )
+    stamp = bump_data_version(db)
+    db.commit()
+    publish_data_version(stamp)
+
+    return buckets.count()
+
+def check_rollup_consistency(db: Session, year: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Compare rollup buckets (optionally of one year) with raw employee counts, returning mismatches"""
+    raw = {
+        (row.year, row.quarter, row.department_id, row.job_id): row.hired
+        for row in db.execute(raw_hires_query(year))
+    }
+
+    buckets = db.query(HiringRollup).filter(HiringRollup.hired != 0)
+    if year is not None:
+        buckets = buckets.filter(HiringRollup.year == year)
+    rollup = {
+        (row.year, row.quarter, row.department_id, row.job_id): row.hired
+        for row in buckets
+    }
+
+    return [
+        {
+            'year': key[0],
+            'quarter': key[1],
+            'department_id': key[2],
+            'job_id': key[3],
+            'raw': raw.get(key, 0),
+            'rollup': rollup.get(key, 0)
+        }
+        for key in sorted(raw.keys() | rollup.keys(), key=str)
+        if raw.get(key, 0) != rollup.get(key, 0)
+    ]
+
+def main(argv: List[str]) -> int:
+    from .database import SessionLocal
+
+    if len(argv) not in (1, 2) or argv[0] not in ('rebuild', 'check') or not all(a.isdigit() for a in argv[1:]):
+        print("Usage: python -m app.rollup [rebuild|check] [year]")
+        return 2
+
+    year = int(argv[1]) if len(argv) == 2 else None
+    db = SessionLocal()
+    try:
+        if argv[0] == 'rebuild':
+            buckets = rebuild_rollup(db, year)
+            print(f"Rebuilt hiring_rollup with {buckets} buckets")
+            return 0
+
+        mismatches = check_rollup_consistency(db, year)
+        for mismatch in mismatches:
+            print(f"Mismatch: {mismatch}")
+        print(f"hiring_rollup is {'inconsistent' if mismatches else 'consistent'} with employees")
+        return 1 if mismatches else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,104 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import extract, select
+from ..database import get_db_with_timeout, EXPORT_STATEMENT_TIMEOUT_MS
+from ..export import EXPORT_MEDIA_TYPES, stream_export
+from ..models import Department, Job, Employee
+from ..rollup import year_range
+from ..schemas import ExportFormat, MetricsFilters
+from .metrics import metrics_filters, hiring_by_quarter_query, departments_above_average_rows
+
+router = APIRouter()
+
+EXPORT_EXTENSIONS = {'csv': 'csv', 'parquet': 'parquet', 'arrow': 'arrows'}
+
+def export_response(db: AsyncSession, query, schema, fmt: ExportFormat, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_export(db, query, schema, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{EXPORT_EXTENSIONS[fmt]}"'}
+    )
+
+def hires_export_query(filters: MetricsFilters):
+    """Employees with their department and job names, hired in the filtered years"""
+    start, _ = year_range(filters.start_year)
+    _, end = year_range(filters.end_year)
+
+    query = select(
+        Employee.id,
+        Employee.name,
+        Employee.datetime,
+        Employee.department_id,
+        Department.department,
+        Employee.job_id,
+        Job.job
+    ).outerjoin(
+        Department, Employee.department_id == Department.id
+    ).outerjoin(
+        Job, Employee.job_id == Job.id
+    ).where(
+        Employee.datetime >= start, Employee.datetime < end
+    )
+
+    if filters.quarter is not None:
+        query = query.where(extract('quarter', Employee.datetime) == filters.quarter)
+    if filters.department_id is not None:
+        query = query.where(Employee.department_id == filters.department_id)
+    if filters.job_id is not None:
+        query = query.where(Employee.job_id == filters.job_id)
+
+    return query.order_by(Employee.datetime, Employee.id)
+
+@router.get("/export/hires")
+async def export_hires(
+    format: ExportFormat = Query('parquet', description="csv, parquet or arrow (IPC stream)"),
+    filters: MetricsFilters = Depends(metrics_filters),
+    db: AsyncSession = Depends(get_db_with_timeout(EXPORT_STATEMENT_TIMEOUT_MS))
+):
+    """Stream raw hires joined with department and job names"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('id', pa.int32()),
+        ('name', pa.string()),
+        ('datetime', pa.timestamp('us')),
+        ('department_id', pa.int32()),
+        ('department', pa.string()),
+        ('job_id', pa.int32()),
+        ('job', pa.string()),
+    ])
+    return export_response(db, hires_export_query(filters), schema, format, "hires")
+
+@router.get("/export/metrics/hiring-by-quarter")
+async def export_hiring_by_quarter(
+    format: ExportFormat = Query('parquet', description="csv, parquet or arrow (IPC stream)"),
+    filters: MetricsFilters = Depends(metrics_filters),
+    db: AsyncSession = Depends(get_db_with_timeout(EXPORT_STATEMENT_TIMEOUT_MS))
+):
+    """Stream the /metrics/hiring-by-quarter result set"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('department', pa.string()),
+        ('job', pa.string()),
+        *((quarter, pa.int64()) for quarter in ('Q1', 'Q2', 'Q3', 'Q4')),
+    ])
+    return export_response(db, hiring_by_quarter_query(filters), schema, format, "hiring_by_quarter")
+
+@router.get("/export/metrics/departments-above-average")
+async def export_departments_above_average(
+    format: ExportFormat = Query('parquet', description="csv, parquet or arrow (IPC stream)"),
+    filters: MetricsFilters = Depends(metrics_filters),
+    db: AsyncSession = Depends(get_db_with_timeout(EXPORT_STATEMENT_TIMEOUT_MS))
+):
+    """Stream the /metrics/departments-above-average result set, including the mean"""
+    import pyarrow as pa
+
+    schema = pa.schema([
+        ('id', pa.int32()),
+        ('department', pa.string()),
+        ('hired', pa.int64()),
+        ('mean_hired', pa.float64()),
+    ])
+    return export_response(db, departments_above_average_rows(filters), schema, format, "departments_above_average")
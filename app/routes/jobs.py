@@ -0,0 +1,14 @@
+from fastapi import APIRouter, HTTPException
+from ..jobs import job_manager
+from ..schemas import JobStatusResponse
+
+router = APIRouter()
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Get progress of a background upload job"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    return job.snapshot()
@@ -1,50 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import text, func, and_, extract, case
-from typing import List
-from ..database import get_db
-from ..models import Employee, Department, Job
-from ..schemas import HiringMetricsResponse, DepartmentHiringResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Float, func, and_, case, cast, select
+from typing import Dict, List, Optional
+from ..cache import metrics_cache
+from ..data_version import data_version, load_data_version
+from ..database import async_engine, get_db, get_db_with_timeout, METRICS_STATEMENT_TIMEOUT_MS
+from ..export import JSON_MEDIA_TYPES, stream_json
+from ..models import Department, Job, HiringRollup
+from ..schemas import HiringMetricsResponse, DepartmentHiringResponse, CacheStatsResponse, PoolStatsResponse, MetricsFilters, JSONStreamFormat
 
 router = APIRouter()
 
+DEFAULT_METRICS_YEAR = 2021
+
+def metrics_filters(
+    year: Optional[int] = Query(None, ge=1900, le=2100, description="Hire year (defaults to 2021)"),
+    start_year: Optional[int] = Query(None, ge=1900, le=2100, description="First hire year of a range"),
+    end_year: Optional[int] = Query(None, ge=1900, le=2100, description="Last hire year of a range (inclusive)"),
+    quarter: Optional[int] = Query(None, ge=1, le=4, description="Only count hires in this quarter"),
+    department_id: Optional[int] = Query(None, description="Only report this department"),
+    job_id: Optional[int] = Query(None, description="Only count hires for this job")
+) -> MetricsFilters:
+    """Resolve metrics query parameters into a year range and optional filters"""
+    if year is not None and (start_year is not None or end_year is not None):
+        raise HTTPException(status_code=400, detail="Use either year or start_year/end_year, not both")
+
+    if year is not None:
+        start_year = end_year = year
+    elif start_year is None and end_year is None:
+        start_year = end_year = DEFAULT_METRICS_YEAR
+    else:
+        start_year = start_year if start_year is not None else end_year
+        end_year = end_year if end_year is not None else start_year
+
+    if start_year > end_year:
+        raise HTTPException(status_code=400, detail="start_year must not be after end_year")
+
+    return MetricsFilters(
+        start_year=start_year,
+        end_year=end_year,
+        quarter=quarter,
+        department_id=department_id,
+        job_id=job_id
+    )
+
+async def data_version_headers(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db)
+) -> Dict[str, str]:
+    """Tag the response with the data version, answering 304 before any query when it is current
+
+    The version is read from the database at most every DATA_VERSION_REFRESH_SECONDS.
+    """
+    if data_version.stale():
+        await load_data_version(db)
+        # End the read so the route's queries begin a transaction with its own settings
+        await db.commit()
+
+    headers = data_version.headers()
+    if data_version.not_modified(request.headers.get('if-none-match'), request.headers.get('if-modified-since')):
+        raise HTTPException(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return headers
+
+def rollup_conditions(filters: MetricsFilters, include_department: bool = True) -> list:
+    """Rollup predicates for the filters; year is the leading key of its unique index"""
+    if filters.start_year == filters.end_year:
+        conditions = [HiringRollup.year == filters.start_year]
+    else:
+        conditions = [HiringRollup.year.between(filters.start_year, filters.end_year)]
+
+    if filters.quarter is not None:
+        conditions.append(HiringRollup.quarter == filters.quarter)
+    if include_department and filters.department_id is not None:
+        conditions.append(HiringRollup.department_id == filters.department_id)
+    if filters.job_id is not None:
+        conditions.append(HiringRollup.job_id == filters.job_id)
+
+    return conditions
+
+def hiring_by_quarter_query(filters: MetricsFilters):
+    """Sum pre-aggregated hiring_rollup buckets into one column per quarter"""
+    return select(
+        Department.department,
+        Job.job,
+        func.sum(case((HiringRollup.quarter == 1, HiringRollup.hired), else_=0)).label('Q1'),
+        func.sum(case((HiringRollup.quarter == 2, HiringRollup.hired), else_=0)).label('Q2'),
+        func.sum(case((HiringRollup.quarter == 3, HiringRollup.hired), else_=0)).label('Q3'),
+        func.sum(case((HiringRollup.quarter == 4, HiringRollup.hired), else_=0)).label('Q4')
+    ).join(
+        HiringRollup, HiringRollup.department_id == Department.id
+    ).join(
+        Job, HiringRollup.job_id == Job.id
+    ).where(
+        *rollup_conditions(filters)
+    ).group_by(
+        Department.department, Job.job
+    ).order_by(
+        Department.department, Job.job
+    )
+
 @router.get("/metrics/hiring-by-quarter", response_model=List[HiringMetricsResponse])
-async def get_hiring_by_quarter(db: Session = Depends(get_db)):
+async def get_hiring_by_quarter(
+    filters: MetricsFilters = Depends(metrics_filters),
+    stream: Optional[JSONStreamFormat] = Query(None, description="Stream rows from a server-side cursor as json or ndjson"),
+    version_headers: Dict[str, str] = Depends(data_version_headers),
+    db: AsyncSession = Depends(get_db_with_timeout(METRICS_STATEMENT_TIMEOUT_MS))
+):
     """
-    Get number of employees hired for each job and department in 2021 divided by quarter.
+    Get number of employees hired for each job and department in the requested years
+    (2021 by default) divided by quarter.
     Results ordered alphabetically by department and job.
     """
-    try:
-        # Define quarter extraction using case statement
-        quarter_case = case(
-            (extract('month', Employee.datetime).between(1, 3), 'Q1'),
-            (extract('month', Employee.datetime).between(4, 6), 'Q2'),
-            (extract('month', Employee.datetime).between(7, 9), 'Q3'),
-            (extract('month', Employee.datetime).between(10, 12), 'Q4'),
-            else_='Other'
+    if stream is not None:
+        return StreamingResponse(
+            stream_json(db, hiring_by_quarter_query(filters), stream),
+            media_type=JSON_MEDIA_TYPES[stream],
+            headers=version_headers
         )
 
-        # Query with joins and aggregations
-        results = db.query(
-            Department.department,
-            Job.job,
-            func.sum(case((quarter_case == 'Q1', 1), else_=0)).label('Q1'),
-            func.sum(case((quarter_case == 'Q2', 1), else_=0)).label('Q2'),
-            func.sum(case((quarter_case == 'Q3', 1), else_=0)).label('Q3'),
-            func.sum(case((quarter_case == 'Q4', 1), else_=0)).label('Q4')
-        ).join(
-            Employee, Employee.department_id == Department.id
-        ).join(
-            Job, Employee.job_id == Job.id
-        ).filter(
-            extract('year', Employee.datetime) == 2021
-        ).group_by(
-            Department.department, Job.job
-        ).order_by(
-            Department.department, Job.job
-        ).all()
-
-        return [
+    cache_key = ('hiring-by-quarter', *filters.model_dump().values())
+    cached = metrics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    try:
+        results = (await db.execute(hiring_by_quarter_query(filters))).all()
+
+        response = [
             HiringMetricsResponse(
                 department=row[0],
                 job=row[1],
@@ -55,60 +141,116 @@ async def get_hiring_by_quarter(db: Session = Depends(get_db)):
             )
             for row in results
         ]
+        metrics_cache.set(cache_key, response)
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving hiring metrics: {str(e)}")
 
-@router.get("/metrics/departments-above-average", response_model=List[DepartmentHiringResponse])
-async def get_departments_above_average(db: Session = Depends(get_db)):
+def departments_above_average_query(filters: MetricsFilters):
+    """Single statement: per-department hires with the mean over all departments as a window"""
+    # Total hires per department from the rollup
+    dept_hires = select(
+        Department.id,
+        Department.department,
+        func.coalesce(func.sum(HiringRollup.hired), 0).label('hired_count')
+    ).outerjoin(
+        HiringRollup, and_(
+            HiringRollup.department_id == Department.id,
+            *rollup_conditions(filters, include_department=False)
+        )
+    ).group_by(
+        Department.id, Department.department
+    ).cte('dept_hires')
+
+    # Attach the overall mean to every row instead of querying it separately
+    with_mean = select(
+        dept_hires.c.id,
+        dept_hires.c.department,
+        dept_hires.c.hired_count,
+        func.avg(dept_hires.c.hired_count).over().label('mean_hired')
+    ).subquery()
+
+    query = select(
+        with_mean.c.id,
+        with_mean.c.department,
+        with_mean.c.hired_count,
+        with_mean.c.mean_hired
+    ).where(
+        with_mean.c.hired_count > with_mean.c.mean_hired
+    )
+    if filters.department_id is not None:
+        query = query.where(with_mean.c.id == filters.department_id)
+
+    return query.order_by(with_mean.c.hired_count.desc())
+
+def departments_above_average_rows(filters: MetricsFilters, include_mean: bool = True):
+    """departments_above_average_query with response field names and a float mean"""
+    above_average = departments_above_average_query(filters).subquery()
+    columns = [
+        above_average.c.id,
+        above_average.c.department,
+        above_average.c.hired_count.label('hired')
+    ]
+    if include_mean:
+        columns.append(cast(above_average.c.mean_hired, Float).label('mean_hired'))
+
+    return select(*columns).order_by(above_average.c.hired_count.desc())
+
+@router.get(
+    "/metrics/departments-above-average",
+    response_model=List[DepartmentHiringResponse],
+    response_model_exclude_none=True
+)
+async def get_departments_above_average(
+    filters: MetricsFilters = Depends(metrics_filters),
+    include_mean: bool = Query(False, description="Include the mean hires per department in each row"),
+    stream: Optional[JSONStreamFormat] = Query(None, description="Stream rows from a server-side cursor as json or ndjson"),
+    version_headers: Dict[str, str] = Depends(data_version_headers),
+    db: AsyncSession = Depends(get_db_with_timeout(METRICS_STATEMENT_TIMEOUT_MS))
+):
     """
-    Get departments that hired more employees than the mean of employees hired in 2021
-    for all departments, ordered by number of employees hired (descending).
+    Get departments that hired more employees than the mean of employees hired in the
+    requested years (2021 by default) for all departments, ordered by number of
+    employees hired (descending). The mean always spans every department;
+    department_id only restricts which departments are reported.
     """
+    if stream is not None:
+        return StreamingResponse(
+            stream_json(db, departments_above_average_rows(filters, include_mean), stream),
+            media_type=JSON_MEDIA_TYPES[stream],
+            headers=version_headers
+        )
+
+    cache_key = ('departments-above-average', include_mean, *filters.model_dump().values())
+    cached = metrics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        # First, get the total hires per department for 2021
-        dept_hires = db.query(
-            Department.id,
-            Department.department,
-            func.count(Employee.id).label('hired_count')
-        ).outerjoin(
-            Employee, and_(
-                Employee.department_id == Department.id,
-                extract('year', Employee.datetime) == 2021
-            )
-        ).group_by(
-            Department.id, Department.department
-        ).subquery()
-
-        # Calculate the overall average
-        avg_result = db.query(
-            func.avg(dept_hires.c.hired_count).label('avg_hires')
-        ).first()
-
-        if not avg_result or avg_result[0] is None:
-            return []
-
-        avg_hires = float(avg_result[0])
-
-        # Get departments above average
-        results = db.query(
-            dept_hires.c.id,
-            dept_hires.c.department,
-            dept_hires.c.hired_count.label('hired')
-        ).filter(
-            dept_hires.c.hired_count > avg_hires
-        ).order_by(
-            dept_hires.c.hired_count.desc()
-        ).all()
-
-        return [
+        results = (await db.execute(departments_above_average_query(filters))).all()
+
+        response = [
             DepartmentHiringResponse(
                 id=int(row[0]),
                 department=row[1],
-                hired=int(row[2])
+                hired=int(row[2]),
+                mean_hired=float(row[3]) if include_mean else None
             )
             for row in results
         ]
+        metrics_cache.set(cache_key, response)
+        return response
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving department metrics: {str(e)}")
+
+@router.get("/metrics/internal/cache", response_model=CacheStatsResponse)
+async def get_metrics_cache_stats():
+    """Get hit/miss/eviction counters of the metrics result cache"""
+    return metrics_cache.stats()
+
+@router.get("/metrics/internal/pool", response_model=PoolStatsResponse)
+async def get_pool_stats():
+    """Get occupancy, waits and checkout latency histogram of the API connection pool"""
+    return async_engine.pool.report()
@@ -1,130 +1,152 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Query
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+import importlib
 import logging
-from ..database import get_db
-from ..csv_processor import CSVProcessor
-from ..schemas import BatchUploadResponse
+from types import ModuleType
+from typing import Optional, Tuple
+from ..compression import COMPRESSION_SUFFIXES, compressed_format, detect_compression
+from ..database import get_db_with_timeout, UPLOAD_STATEMENT_TIMEOUT_MS
+from ..jobs import job_manager, JobRunner
+from ..rejects import rejects_path
+from ..schemas import BatchUploadResponse, JobAcceptedResponse, ReferenceUploadMode, UploadCompression, UploadFormat
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/upload/departments", response_model=BatchUploadResponse)
+FORCE_DESCRIPTION = "Load the file even if it is identical to the last upload"
+
+BACKGROUND_RESPONSES = {202: {"model": JobAcceptedResponse, "description": "Upload queued as a background job"}}
+
+async def load_ingestion() -> ModuleType:
+    """app.ingestion, imported on the first upload instead of at startup
+
+    It brings in pandas, numpy and the CSV processor, which take most of the
+    app's import time, so the import runs in the threadpool to keep the event
+    loop serving meanwhile; later calls find it in sys.modules.
+    """
+    return await run_in_threadpool(importlib.import_module, '..ingestion', __package__)
+
+def upload_format(file: UploadFile) -> Tuple[UploadFormat, Optional[UploadCompression]]:
+    """CSV, Parquet or Arrow IPC, and the CSV's compression, from the file's magic bytes or extension"""
+    # Already imported by load_ingestion
+    from ..csv_processor import CSVProcessor
+
+    try:
+        compression = detect_compression(file.filename, file.file)
+        if compression is not None:
+            return compressed_format(file.filename), compression
+        return CSVProcessor.detect_format(file.filename, file.file), None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def submit_background_job(
+    kind: str, file: UploadFile, fmt: UploadFormat, compression: Optional[UploadCompression],
+    db: AsyncSession, runner: JobRunner
+) -> JSONResponse:
+    """Spool the upload, still compressed if it was, and hand it to the ingestion worker pool"""
+    # Workers open their own sessions against the same engine and timeout as the request
+    session_factory = async_sessionmaker(db.bind, autoflush=False, expire_on_commit=False, info=dict(db.info))
+    suffix = f".{fmt}{COMPRESSION_SUFFIXES.get(compression, '')}"
+    job = await job_manager.submit(kind, file.file, suffix, session_factory, runner)
+    accepted = JobAcceptedResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"/api/v1/jobs/{job.id}"
+    )
+    return JSONResponse(status_code=202, content=accepted.model_dump())
+
+@router.post("/upload/departments", response_model=BatchUploadResponse, responses=BACKGROUND_RESPONSES)
 async def upload_departments_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    mode: ReferenceUploadMode = Query('skip', description="How to treat existing ids with a different name"),
+    background: bool = Query(False, description="Process the upload as a background job"),
+    force: bool = Query(False, description=FORCE_DESCRIPTION),
+    db: AsyncSession = Depends(get_db_with_timeout(UPLOAD_STATEMENT_TIMEOUT_MS))
 ):
-    """Upload departments CSV file"""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="File must be CSV format")
+    """Upload departments CSV (optionally gzip/zstd compressed), Parquet or Arrow IPC file"""
+    ingestion = await load_ingestion()
+    fmt, compression = upload_format(file)
+
+    if background:
+        return await submit_background_job(
+            "departments", file, fmt, compression, db,
+            lambda job_db, source, job: ingestion.ingest_departments(job_db, source, mode, fmt, force, compression)
+        )
 
     try:
-        content = await file.read()
-        departments_data = CSVProcessor.process_departments_csv(content)
-
-        processed_count = 0
-        errors = []
-
-        for dept_data in departments_data:
-            try:
-                from ..models import Department
-                # Check if department already exists
-                existing = db.query(Department).filter(Department.id == dept_data['id']).first()
-                if existing:
-                    continue
-
-                department = Department(
-                    id=dept_data['id'],
-                    department=dept_data['department']
-                )
-                db.add(department)
-                processed_count += 1
-            except Exception as e:
-                errors.append(f"Error processing department {dept_data.get('id')}: {str(e)}")
-
-        db.commit()
-        return BatchUploadResponse(
-            message="Departments uploaded successfully",
-            processed_rows=processed_count,
-            errors=errors
-        )
+        return await ingestion.ingest_departments(db, file.file, mode, fmt, force, compression)
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error uploading departments: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload/jobs", response_model=BatchUploadResponse)
+@router.post("/upload/jobs", response_model=BatchUploadResponse, responses=BACKGROUND_RESPONSES)
 async def upload_jobs_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    mode: ReferenceUploadMode = Query('skip', description="How to treat existing ids with a different name"),
+    background: bool = Query(False, description="Process the upload as a background job"),
+    force: bool = Query(False, description=FORCE_DESCRIPTION),
+    db: AsyncSession = Depends(get_db_with_timeout(UPLOAD_STATEMENT_TIMEOUT_MS))
 ):
-    """Upload jobs CSV file"""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="File must be CSV format")
+    """Upload jobs CSV (optionally gzip/zstd compressed), Parquet or Arrow IPC file"""
+    ingestion = await load_ingestion()
+    fmt, compression = upload_format(file)
+
+    if background:
+        return await submit_background_job(
+            "jobs", file, fmt, compression, db,
+            lambda job_db, source, job: ingestion.ingest_jobs(job_db, source, mode, fmt, force, compression)
+        )
 
     try:
-        content = await file.read()
-        jobs_data = CSVProcessor.process_jobs_csv(content)
-
-        processed_count = 0
-        errors = []
-
-        for job_data in jobs_data:
-            try:
-                from ..models import Job
-                # Check if job already exists
-                existing = db.query(Job).filter(Job.id == job_data['id']).first()
-                if existing:
-                    continue
-
-                job = Job(
-                    id=job_data['id'],
-                    job=job_data['job']
-                )
-                db.add(job)
-                processed_count += 1
-            except Exception as e:
-                errors.append(f"Error processing job {job_data.get('id')}: {str(e)}")
-
-        db.commit()
-        return BatchUploadResponse(
-            message="Jobs uploaded successfully",
-            processed_rows=processed_count,
-            errors=errors
-        )
+        return await ingestion.ingest_jobs(db, file.file, mode, fmt, force, compression)
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error uploading jobs: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/upload/employees", response_model=BatchUploadResponse)
+@router.post("/upload/employees", response_model=BatchUploadResponse, responses=BACKGROUND_RESPONSES)
 async def upload_employees_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    chunk_size: int = Query(1000, ge=1, le=100000, description="Rows parsed and written per batch"),
+    parse_workers: Optional[int] = Query(
+        None, ge=1, le=64, description="Processes parsing the file in parallel (default: EMPLOYEE_PARSE_WORKERS)"
+    ),
+    background: bool = Query(False, description="Process the upload as a background job"),
+    force: bool = Query(False, description=FORCE_DESCRIPTION),
+    db: AsyncSession = Depends(get_db_with_timeout(UPLOAD_STATEMENT_TIMEOUT_MS))
 ):
-    """Upload employees CSV file with batch processing"""
-    if not file.filename.endswith('.csv'):
-        raise HTTPException(status_code=400, detail="File must be CSV format")
+    """Upload employees CSV (optionally gzip/zstd compressed), Parquet or Arrow IPC file, streaming it in chunks of chunk_size rows"""
+    ingestion = await load_ingestion()
+    fmt, compression = upload_format(file)
+
+    if background:
+        return await submit_background_job(
+            "employees", file, fmt, compression, db,
+            lambda job_db, source, job: ingestion.ingest_employees(
+                job_db, source, chunk_size, job.record_batch, parse_workers, fmt, force, compression,
+                upload_id=job.id
+            )
+        )
 
     try:
-        content = await file.read()
-        employee_batches = CSVProcessor.process_employees_csv(content)
-
-        total_processed = 0
-        all_errors = []
-
-        for batch in employee_batches:
-            processed, errors = CSVProcessor.save_batch_to_db(db, batch)
-            total_processed += processed
-            all_errors.extend(errors)
-
-        return BatchUploadResponse(
-            message=f"Employees uploaded successfully in {len(employee_batches)} batches",
-            processed_rows=total_processed,
-            errors=all_errors
+        return await ingestion.ingest_employees(
+            db, file.file, chunk_size, parse_workers=parse_workers, fmt=fmt, force=force, compression=compression
         )
 
     except Exception as e:
         logger.error(f"Error uploading employees: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/uploads/{upload_id}/rejects", response_class=FileResponse)
+async def download_rejects(upload_id: str):
+    """Download every row rejected by an employees upload as CSV: line, reason and the row's values"""
+    path = rejects_path(upload_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"No rejects for upload {upload_id}")
+
+    return FileResponse(path, media_type="text/csv", filename=f"rejects-{upload_id}.csv")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal, Dict
 from datetime import datetime
 
 class DepartmentBase(BaseModel):
@@ -36,9 +36,56 @@ class EmployeeResponse(EmployeeBase):
     class Config:
         from_attributes = True
 
+# How departments/jobs uploads treat ids that already exist with another name
+ReferenceUploadMode = Literal['skip', 'update', 'replace']
+
+# File formats accepted by the upload endpoints, and the extensions they are recognised by
+UploadFormat = Literal['csv', 'parquet', 'arrow']
+UPLOAD_FORMAT_EXTENSIONS: Dict[str, UploadFormat] = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.arrow': 'arrow',
+    '.arrows': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+}
+
+# Columns of employees uploads, in file order
+EMPLOYEE_COLUMNS = ['id', 'name', 'datetime', 'department_id', 'job_id']
+
+# Compression codecs of CSV uploads, decompressed while they are parsed
+UploadCompression = Literal['gzip', 'zstd']
+
+# File formats produced by the export endpoints
+ExportFormat = Literal['csv', 'parquet', 'arrow']
+
+# Streaming response modes of the metrics endpoints
+JSONStreamFormat = Literal['json', 'ndjson']
+
+class RejectedRow(BaseModel):
+    # Line of the row in the uploaded file (row number for Parquet/Arrow IPC)
+    line: int
+    reason: str
+    values: Dict[str, Optional[str]]
+
 class BatchUploadResponse(BaseModel):
     message: str
+    # Id of the employees upload, whose rejected rows are served at rejects_url
+    upload_id: Optional[str] = None
     processed_rows: int
+    updated_rows: int = 0
+    skipped_rows: int = 0
+    deleted_rows: int = 0
+    # Rows identical to the ones last uploaded, not written again
+    unchanged_rows: int = 0
+    # Rows dropped by validation, per reason (see EMPLOYEE_REJECT_REASONS)
+    rejected_rows: Dict[str, int] = {}
+    # The first rejected rows; the full set is downloaded from rejects_url
+    rejected_sample: List[RejectedRow] = []
+    rejects_url: Optional[str] = None
+    # Errors per category; errors only keeps the first UPLOAD_ERROR_SAMPLES messages
+    error_counts: Dict[str, int] = {}
     errors: List[str] = []
 
 class HiringMetricsResponse(BaseModel):
@@ -53,3 +100,59 @@ class DepartmentHiringResponse(BaseModel):
     id: int
     department: str
     hired: int
+    mean_hired: Optional[float] = None
+
+class JobAcceptedResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+
+class JobStatusResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    message: Optional[str] = None
+    rows_parsed: int
+    inserted_rows: int
+    skipped_rows: int
+    unchanged_rows: int = 0
+    rejected_rows: Dict[str, int] = {}
+    rejected_sample: List[RejectedRow] = []
+    rejects_url: Optional[str] = None
+    error_counts: Dict[str, int] = {}
+    errors: List[str] = []
+    rows_per_second: float
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class CacheStatsResponse(BaseModel):
+    size: int
+    maxsize: int
+    ttl: float
+    hits: int
+    misses: int
+    hit_rate: float
+    evictions: int
+    expirations: int
+    invalidations: int
+
+class PoolStatsResponse(BaseModel):
+    pool_size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    checkouts: int
+    waits: int
+    timeouts: int
+    wait_seconds: float
+    checkout_seconds: float
+    checkout_latency_ms: Dict[str, int]
+
+class MetricsFilters(BaseModel):
+    start_year: int
+    end_year: int
+    quarter: Optional[int] = None
+    department_id: Optional[int] = None
+    job_id: Optional[int] = None
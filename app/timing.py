@@ -0,0 +1,195 @@
+"""
+Per-request timings, reported in Server-Timing headers and one structured log line per request.
+
+RequestTimingMiddleware starts a RequestTimings for every HTTP request and
+makes it current for everything the request runs, including threadpool calls
+and AsyncSession.run_sync. Code marks its stages with `with timed('parse'):`
+(uploads use read, parse, validate, write and commit) and every SQL statement
+executed meanwhile is timed through engine events. Outside a request, e.g. in
+background jobs, timed() does nothing.
+
+With REQUEST_PROFILING enabled, `?profile=1` replaces the response with a
+cProfile report of the request. The profiler sees everything the event loop
+runs meanwhile, and work done in the threadpool is not included, so keep it
+to development machines.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders, QueryParams
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "false").lower() in ("1", "true", "yes")
+
+# Statements listed one by one in Server-Timing and the request log; the rest are only summed up
+TIMING_MAX_QUERIES = int(os.getenv("TIMING_MAX_QUERIES", "20"))
+
+PROFILE_TOP_FUNCTIONS = 60
+
+class RequestTimings:
+    """Accumulated seconds per stage and per SQL statement of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.queries: List[Tuple[str, float]] = []
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_query(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.query_count += 1
+            self.query_seconds += seconds
+            if len(self.queries) < TIMING_MAX_QUERIES:
+                self.queries.append((statement, seconds))
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, in milliseconds"""
+        with self._lock:
+            metrics = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in self.stages.items()]
+            if self.query_count:
+                metrics.append(f'db;dur={self.query_seconds * 1000:.1f};desc="{self.query_count} queries"')
+                metrics.extend(f"db{i};dur={seconds * 1000:.1f}" for i, (_, seconds) in enumerate(self.queries, 1))
+        metrics.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(metrics)
+
+    def log_record(self, method: str, path: str, status: int) -> dict:
+        with self._lock:
+            return {
+                'event': 'request_timing',
+                'method': method,
+                'path': path,
+                'status': status,
+                'total_ms': round(self.elapsed() * 1000, 1),
+                'stages_ms': {stage: round(seconds * 1000, 1) for stage, seconds in self.stages.items()},
+                'query_count': self.query_count,
+                'query_ms': round(self.query_seconds * 1000, 1),
+                'queries': [
+                    {'ms': round(seconds * 1000, 1), 'sql': ' '.join(statement.split())[:200]}
+                    for statement, seconds in self.queries
+                ],
+            }
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar('current_timings', default=None)
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Add the time spent in the block to stage of the current request, if any"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if current_timings.get() is not None:
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def record_query_time(conn, cursor, statement, parameters, context, executemany):
+    timings = current_timings.get()
+    started = conn.info.get('query_started')
+    if timings is not None and started:
+        timings.add_query(statement, time.perf_counter() - started.pop())
+
+@event.listens_for(Engine, "handle_error")
+def drop_query_timer(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started'):
+        connection.info['query_started'].pop()
+
+def profile_report(profiler: cProfile.Profile) -> str:
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(PROFILE_TOP_FUNCTIONS)
+    return out.getvalue()
+
+# cProfile can't run two profilers at once
+_profiling = threading.Lock()
+
+class RequestTimingMiddleware:
+    """Time every HTTP request, adding Server-Timing to its response and logging the stages
+
+    A plain ASGI middleware, so streamed responses pass through untouched;
+    their Server-Timing covers the time until the headers were sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status = [500]
+
+        async def send_with_timing(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+                MutableHeaders(scope=message).append('Server-Timing', timings.server_timing())
+            await send(message)
+
+        try:
+            if REQUEST_PROFILING and QueryParams(scope['query_string']).get('profile') == '1':
+                await self.profile(scope, receive, send_with_timing)
+            else:
+                await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            logger.info(json.dumps(timings.log_record(scope['method'], scope['path'], status[0])))
+
+    async def profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Run the request under cProfile and answer with the report instead of its response"""
+        if not _profiling.acquire(blocking=False):
+            response = JSONResponse({'detail': "Another request is being profiled"}, status_code=409)
+            await response(scope, receive, send)
+            return
+
+        profiled_status = []
+
+        async def discard(message: Message) -> None:
+            if message['type'] == 'http.response.start':
+                profiled_status.append(message['status'])
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.disable()
+        finally:
+            _profiling.release()
+
+        headers = {'X-Profiled-Status': str(profiled_status[0])} if profiled_status else {}
+        await PlainTextResponse(profile_report(profiler), headers=headers)(scope, receive, send)
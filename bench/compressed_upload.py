@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for compressed employee CSV uploads, per codec.
+
+Compresses a synthetic employees CSV with each codec (none, gzip, zstd) and
+reports the compressed size and the rows/sec and MiB/s of decompressed CSV
+that CSVProcessor parses while decompressing it block by block, as
+ingest_employees does. No database is involved by default; with --live each
+file is also uploaded to a live API on BENCH_DATABASE_URL (emptied before each
+codec), so the upload includes the transfer and the writes, plus the plain CSV
+sent as a gzip-compressed request body (Content-Encoding: gzip). zstd needs
+the zstandard package.
+
+Usage: python -m bench.compressed_upload [--rows 1000000] [--codecs none gzip zstd] [--live]
+"""
+
+import argparse
+import gzip
+import io
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from app.compression import COMPRESSION_SUFFIXES, open_decompressed
+from app.csv_processor import CSVProcessor
+from bench.common import reset_database, start_server
+from bench.datagen import generate_employees_csv
+
+CODECS = ['none', 'gzip', 'zstd']
+
+
+def compress(content: bytes, codec: str, level: Optional[int]) -> bytes:
+    if codec == 'none':
+        return content
+    if codec == 'gzip':
+        return gzip.compress(content, compresslevel=level or 6)
+
+    import zstandard
+
+    return zstandard.ZstdCompressor(level=level or 3).compress(content)
+
+
+def time_parsing(compressed: bytes, codec: str, batch_size: int) -> tuple[int, float]:
+    start = time.perf_counter()
+    source = open_decompressed(io.BytesIO(compressed), None if codec == 'none' else codec)
+    rows = sum(len(batch) for batch in CSVProcessor.iter_employee_batches(source, batch_size))
+    return rows, time.perf_counter() - start
+
+
+def time_upload(client: httpx.Client, compressed: bytes, codec: str, batch_size: int,
+                content_encoding: bool = False) -> tuple[int, float]:
+    reset_database()
+    filename = "employees.csv" + ('' if codec == 'none' or content_encoding else COMPRESSION_SUFFIXES[codec])
+    start = time.perf_counter()
+    if content_encoding:
+        # The whole multipart body is gzipped, so build it first and compress that
+        request = client.build_request(
+            "POST", "/api/v1/upload/employees", params={'chunk_size': batch_size},
+            files={"file": (filename, compressed, "text/csv")}
+        )
+        body = gzip.compress(request.read(), compresslevel=1)
+        request = client.build_request(
+            "POST", request.url, content=body,
+            headers={'Content-Type': request.headers['Content-Type'], 'Content-Encoding': 'gzip'}
+        )
+        response = client.send(request)
+    else:
+        response = client.post(
+            "/api/v1/upload/employees", params={'chunk_size': batch_size},
+            files={"file": (filename, compressed, "application/octet-stream")}
+        )
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return response.json()['processed_rows'], elapsed
+
+
+def report(name: str, rows: int, seconds: float, csv_bytes: int):
+    print(f"{name:<22} {rows:>10,} rows  {seconds:8.2f}s  {rows / seconds:>12,.0f} rows/sec  "
+          f"{csv_bytes / 1024 / 1024 / seconds:8.1f} MiB/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--codecs', nargs='+', choices=CODECS, default=CODECS)
+    parser.add_argument('--level', type=int, help="Compression level (default: gzip 6, zstd 3)")
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--live', action='store_true', help="Also upload every file to a live API")
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic employee rows...")
+    content = generate_employees_csv(args.rows)
+    print(f"CSV {len(content) / 1024 / 1024:.1f} MiB")
+
+    files = {}
+    for codec in args.codecs:
+        start = time.perf_counter()
+        files[codec] = compress(content, codec, args.level)
+        print(f"{codec:<6} {len(files[codec]) / 1024 / 1024:8.1f} MiB  ratio {len(content) / len(files[codec]):5.1f}x  "
+              f"compressed in {time.perf_counter() - start:.2f}s")
+
+    print("\nParsing while decompressing")
+    for codec, compressed in files.items():
+        report(codec, *time_parsing(compressed, codec, args.batch_size), len(content))
+
+    if not args.live:
+        return
+
+    print("\nUploading to a live API")
+    server = start_server(str(Path(__file__).resolve().parent.parent), args.port)
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=3600) as client:
+            for codec, compressed in files.items():
+                report(codec, *time_upload(client, compressed, codec, args.batch_size), len(content))
+            report("Content-Encoding: gzip", *time_upload(client, content, 'none', args.batch_size, True), len(content))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Deterministic synthetic departments, jobs and employees files.
+
+The same seed, sizes and ratios always produce byte-identical files, so runs on
+different commits ingest exactly the same data. Employees are generated in
+chunks of GENERATOR_CHUNK_ROWS, which keeps memory flat up to tens of millions
+of rows. null_ratio blanks each employee's department_id and job_id
+independently; invalid_ratio corrupts whole rows (bad id, bad datetime, missing
+name, unknown department or unknown job) that ingestion is expected to reject.
+
+Usage:
+  python -m bench.datagen --out-dir data/bench --rows 1000000 [--null-ratio 0.01] [--invalid-ratio 0.001]
+"""
+
+import argparse
+import io
+from pathlib import Path
+from typing import Dict, TextIO
+
+import numpy as np
+import pandas as pd
+
+GENERATOR_CHUNK_ROWS = 1_000_000
+
+DEFAULT_DEPARTMENTS = 12
+DEFAULT_JOBS = 183
+
+# Ways an invalid employee row is corrupted, picked uniformly per row
+INVALID_KINDS = ('id', 'datetime', 'name', 'department_id', 'job_id')
+
+
+def reference_frame(count: int, label: str, seed: int = 42, invalid_ratio: float = 0.0) -> pd.DataFrame:
+    """ids 1..count named '<label> <id>', plus interleaved rows with a bad id or no name
+
+    Invalid rows come on top of the valid ones, so every id in 1..count exists.
+    """
+    rng = np.random.default_rng([seed, 1, count])
+    frame = pd.DataFrame({'id': np.arange(1, count + 1).astype(str), 'name': [f"{label} {i}" for i in range(1, count + 1)]})
+
+    invalid = int(round(count * invalid_ratio))
+    if invalid:
+        bad = pd.DataFrame({
+            'id': [f"x{i}" if i % 2 else str(count + i) for i in range(invalid)],
+            'name': [f"{label} x{i}" if i % 2 else "" for i in range(invalid)],
+        })
+        positions = np.sort(rng.integers(0, count + 1, invalid))
+        frame = pd.concat([frame, bad.set_axis(positions - 0.5)]).sort_index(kind='stable')
+
+    return frame
+
+
+def employees_chunk(
+    start: int, rows: int, seed: int, chunk: int,
+    null_ratio: float, invalid_ratio: float,
+    departments: int, jobs: int, start_year: int, years: int
+) -> pd.DataFrame:
+    """Employees start+1..start+rows; each chunk has its own random stream"""
+    rng = np.random.default_rng([seed, 0, chunk])
+    span_seconds = int((pd.Timestamp(f"{start_year + years}-01-01") - pd.Timestamp(f"{start_year}-01-01")).total_seconds())
+    hired_at = pd.Timestamp(f"{start_year}-01-01") + pd.to_timedelta(rng.integers(0, span_seconds, rows), unit='s')
+
+    ids = np.arange(start + 1, start + rows + 1)
+    frame = pd.DataFrame({
+        'id': ids.astype(str),
+        'name': [f"Employee {i}" for i in ids],
+        'datetime': hired_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'department_id': pd.Series(rng.integers(1, departments + 1, rows), dtype='Int64'),
+        'job_id': pd.Series(rng.integers(1, jobs + 1, rows), dtype='Int64'),
+    })
+    frame.loc[rng.random(rows) < null_ratio, 'department_id'] = pd.NA
+    frame.loc[rng.random(rows) < null_ratio, 'job_id'] = pd.NA
+
+    invalid = rng.random(rows) < invalid_ratio
+    kinds = rng.integers(0, len(INVALID_KINDS), rows)
+    for index, kind in enumerate(INVALID_KINDS):
+        mask = invalid & (kinds == index)
+        if kind == 'id':
+            frame.loc[mask, 'id'] = 'x' + frame.loc[mask, 'id']
+        elif kind == 'datetime':
+            frame.loc[mask, 'datetime'] = 'not-a-date'
+        elif kind == 'name':
+            frame.loc[mask, 'name'] = ''
+        elif kind == 'department_id':
+            frame.loc[mask, 'department_id'] = departments + 1
+        else:
+            frame.loc[mask, 'job_id'] = jobs + 1
+
+    return frame
+
+
+def write_employees_csv(
+    out: TextIO, rows: int, seed: int = 42,
+    null_ratio: float = 0.01, invalid_ratio: float = 0.0,
+    departments: int = DEFAULT_DEPARTMENTS, jobs: int = DEFAULT_JOBS,
+    start_year: int = 2020, years: int = 3
+) -> int:
+    """Write a headerless employees CSV to out; returns the number of invalid rows"""
+    invalid = 0
+    for chunk, start in enumerate(range(0, rows, GENERATOR_CHUNK_ROWS)):
+        frame = employees_chunk(
+            start, min(GENERATOR_CHUNK_ROWS, rows - start), seed, chunk,
+            null_ratio, invalid_ratio, departments, jobs, start_year, years
+        )
+        invalid += int(
+            (~frame['id'].str.isdigit() | (frame['datetime'] == 'not-a-date') | (frame['name'] == '') |
+             (frame['department_id'] > departments).fillna(False) | (frame['job_id'] > jobs).fillna(False)).sum()
+        )
+        frame.to_csv(out, header=False, index=False)
+    return invalid
+
+
+def generate_employees_csv(rows: int, seed: int = 42, null_ratio: float = 0.01, invalid_ratio: float = 0.0) -> bytes:
+    """In-memory employees CSV for the micro-benchmarks"""
+    buffer = io.StringIO()
+    write_employees_csv(buffer, rows, seed, null_ratio, invalid_ratio)
+    return buffer.getvalue().encode()
+
+
+def write_dataset(
+    out_dir: Path, rows: int, seed: int = 42,
+    null_ratio: float = 0.01, invalid_ratio: float = 0.0,
+    departments: int = DEFAULT_DEPARTMENTS, jobs: int = DEFAULT_JOBS
+) -> Dict[str, dict]:
+    """Write departments.csv, jobs.csv and hired_employees.csv into out_dir
+
+    Returns, per upload kind, the file path, its row count and how many of those rows are invalid.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    dataset = {}
+
+    for kind, label, count in (('departments', 'Department', departments), ('jobs', 'Job', jobs)):
+        frame = reference_frame(count, label, seed, invalid_ratio)
+        path = out_dir / f"{kind}.csv"
+        frame.to_csv(path, header=False, index=False)
+        dataset[kind] = {'path': path, 'rows': len(frame), 'invalid_rows': len(frame) - count}
+
+    path = out_dir / "hired_employees.csv"
+    with open(path, 'w', newline='') as f:
+        invalid = write_employees_csv(f, rows, seed, null_ratio, invalid_ratio, departments, jobs)
+    dataset['employees'] = {'path': path, 'rows': rows, 'invalid_rows': invalid}
+
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--out-dir', type=Path, required=True)
+    parser.add_argument('--rows', type=int, default=100_000, help="Employee rows, 10k to 10M")
+    parser.add_argument('--departments', type=int, default=DEFAULT_DEPARTMENTS)
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--null-ratio', type=float, default=0.01)
+    parser.add_argument('--invalid-ratio', type=float, default=0.0)
+    args = parser.parse_args()
+
+    dataset = write_dataset(
+        args.out_dir, args.rows, args.seed, args.null_ratio, args.invalid_ratio, args.departments, args.jobs
+    )
+    for kind, info in dataset.items():
+        print(f"{kind:<12} {info['rows']:>12,} rows  {info['invalid_rows']:>10,} invalid  {info['path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for employee CSV cleaning and conversion.
+
+Compares the previous row-by-row conversion (per-cell apply + iterrows into dicts)
+with the vectorized CSVProcessor.clean_employees_frame on a synthetic file.
+
+Usage: python -m bench.employee_conversion [--rows 1000000]
+"""
+
+import argparse
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.csv_processor import CSVProcessor, EMPLOYEE_COLUMNS
+from app.reference_index import ReferenceIds
+from bench.datagen import DEFAULT_DEPARTMENTS, DEFAULT_JOBS, generate_employees_csv
+
+# Ids the legacy conversion accepted
+REFERENCE = ReferenceIds(np.arange(1, DEFAULT_DEPARTMENTS + 1), np.arange(1, DEFAULT_JOBS + 1))
+
+
+def legacy_convert(df: pd.DataFrame) -> list:
+    """Row-by-row conversion as implemented before vectorization"""
+    df = df.dropna(subset=['name', 'datetime'])
+    df['id'] = pd.to_numeric(df['id'], errors='coerce').astype('Int64')
+    df['department_id'] = pd.to_numeric(df['department_id'], errors='coerce').astype('Int64')
+    df['job_id'] = pd.to_numeric(df['job_id'], errors='coerce').astype('Int64')
+    df = df[
+        (df['department_id'].isna() | ((df['department_id'] >= 1) & (df['department_id'] <= 12))) &
+        (df['job_id'].isna() | ((df['job_id'] >= 1) & (df['job_id'] <= 183)))
+    ]
+    df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
+    df = df.dropna(subset=['datetime', 'id'])
+    df['id'] = df['id'].astype(int)
+
+    def safe_nullable_int(value):
+        return None if pd.isna(value) else int(value)
+
+    df['department_id'] = df['department_id'].apply(safe_nullable_int)
+    df['job_id'] = df['job_id'].apply(safe_nullable_int)
+
+    records = []
+    for _, row in df.iterrows():
+        records.append({
+            'id': int(row['id']),
+            'name': str(row['name']),
+            'datetime': row['datetime'].to_pydatetime() if pd.notna(row['datetime']) else None,
+            'department_id': int(row['department_id']) if pd.notna(row['department_id']) else None,
+            'job_id': int(row['job_id']) if pd.notna(row['job_id']) else None
+        })
+    return records
+
+
+def time_conversion(name: str, convert, raw: pd.DataFrame) -> float:
+    start = time.perf_counter()
+    result = convert(raw.copy())
+    elapsed = time.perf_counter() - start
+    rows_per_sec = len(raw) / elapsed
+    print(f"{name:<12} {len(result):>10} rows  {elapsed:8.2f}s  {rows_per_sec:>12,.0f} rows/sec")
+    return rows_per_sec
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic employee rows...")
+    content = generate_employees_csv(args.rows)
+    raw = pd.read_csv(io.BytesIO(content), header=None, names=EMPLOYEE_COLUMNS, dtype={'name': str, 'datetime': str})
+
+    legacy = time_conversion('iterrows', legacy_convert, raw)
+    vectorized = time_conversion('vectorized', lambda df: CSVProcessor.clean_employees_frame(df, REFERENCE), raw)
+    print(f"Speedup: {vectorized / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
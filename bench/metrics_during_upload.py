@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark: /metrics/* latency while a large employees upload runs.
+
+Starts the API with uvicorn against BENCH_DATABASE_URL (wiped), measures metrics
+latency with the server idle, then again while an N-row employees CSV is being
+uploaded. The metrics result cache is disabled so every request hits the database.
+
+Usage:
+  BENCH_DATABASE_URL=postgresql://... python -m bench.metrics_during_upload --rows 500000
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from bench.common import format_latency, latency_summary, reset_database, start_server
+from bench.datagen import generate_employees_csv
+
+METRICS_PATHS = [
+    "/api/v1/metrics/hiring-by-quarter",
+    "/api/v1/metrics/departments-above-average",
+]
+
+
+def sample_metrics(client: httpx.Client, keep_going) -> list:
+    timings = []
+    while keep_going():
+        for path in METRICS_PATHS:
+            start = time.perf_counter()
+            client.get(path).raise_for_status()
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--idle-requests', type=int, default=100)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--app-dir', default=str(Path(__file__).resolve().parent.parent),
+                        help="Checkout whose app package is served (to compare commits)")
+    args = parser.parse_args()
+
+    reset_database()
+    with tempfile.NamedTemporaryFile(suffix=".csv") as csv_file:
+        csv_file.write(generate_employees_csv(args.rows))
+        csv_file.flush()
+
+        server = start_server(args.app_dir, args.port)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            with httpx.Client(base_url=base_url, timeout=600) as client:
+                remaining = [args.idle_requests]
+
+                def idle_budget():
+                    remaining[0] -= 1
+                    return remaining[0] >= 0
+
+                print(f"idle           {format_latency(latency_summary(sample_metrics(client, idle_budget)))}")
+
+                upload_done = threading.Event()
+                upload_result = {}
+
+                def upload():
+                    start = time.perf_counter()
+                    with open(csv_file.name, 'rb') as f, httpx.Client(base_url=base_url, timeout=3600) as uploader:
+                        response = uploader.post(
+                            "/api/v1/upload/employees", params={"chunk_size": 10000},
+                            files={"file": ("employees.csv", f, "text/csv")}
+                        )
+                    upload_result['seconds'] = time.perf_counter() - start
+                    upload_result['status'] = response.status_code
+                    upload_done.set()
+
+                uploader = threading.Thread(target=upload)
+                uploader.start()
+                during = sample_metrics(client, lambda: not upload_done.is_set())
+                uploader.join()
+
+                print(f"during upload  {format_latency(latency_summary(during))}")
+                print(f"upload of {args.rows:,} rows: HTTP {upload_result['status']} in {upload_result['seconds']:.1f}s")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
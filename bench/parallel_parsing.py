@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Scaling benchmark for parallel employee CSV parsing.
+
+Parses a synthetic employees CSV with CSVProcessor.iter_employee_batches_parallel
+for an increasing number of worker processes (up to the core count by default)
+and reports throughput and speedup over the in-process parser. No database is
+involved; batches are consumed in order as the ingestion writer would.
+
+Usage: python -m bench.parallel_parsing [--rows 5000000] [--workers 1 2 4 8]
+"""
+
+import argparse
+import io
+import os
+import time
+
+from app.csv_processor import CSVProcessor
+from bench.datagen import generate_employees_csv
+
+
+def time_parsing(content: bytes, workers: int, batch_size: int, chunk_bytes: int) -> float:
+    start = time.perf_counter()
+    rows = 0
+    for batch in CSVProcessor.iter_employee_batches_parallel(io.BytesIO(content), batch_size, workers, chunk_bytes):
+        rows += len(batch)
+    elapsed = time.perf_counter() - start
+    return rows / elapsed
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--workers', type=int, nargs='+',
+                        default=sorted({1, *(2 ** i for i in range(1, cores.bit_length())), cores}))
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--chunk-mb', type=float, default=8)
+    args = parser.parse_args()
+
+    print(f"Generating {args.rows:,} synthetic employee rows...")
+    content = generate_employees_csv(args.rows)
+    chunk_bytes = int(args.chunk_mb * 1024 * 1024)
+    print(f"{len(content) / 1024 / 1024:.0f} MiB, {cores} cores")
+
+    baseline = None
+    for workers in args.workers:
+        rows_per_sec = time_parsing(content, workers, args.batch_size, chunk_bytes)
+        baseline = baseline or rows_per_sec
+        print(f"workers={workers:<3} {rows_per_sec:>12,.0f} rows/sec  speedup {rows_per_sec / baseline:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Cold start benchmark: how soon a fresh API process can answer requests.
+
+Each of --runs rounds measures, in new processes:
+
+  import          importing app.main in a bare interpreter, and which of
+                  pandas, numpy and pyarrow that loaded
+  first_response  spawning uvicorn until its first successful GET /health,
+                  polled every --poll-ms
+  first_upload    the first upload to that server (a small departments file),
+                  which pays for the upload modules imported on first use
+
+first_upload needs the schema on BENCH_DATABASE_URL, created (and emptied)
+before the runs; skip it with --no-upload to time startup without a
+database. Serve another checkout with --app-dir to compare commits:
+
+  BENCH_DATABASE_URL=postgresql://... python -m bench.startup --runs 10
+  python -m bench.startup --runs 10 --no-upload --app-dir ../other-checkout
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from bench.common import BENCH_DATABASE_URL, format_latency, latency_summary, reset_database
+
+HEAVY_MODULES = ('pandas', 'numpy', 'pyarrow')
+
+IMPORT_SCRIPT = f"""
+import sys, time
+start = time.perf_counter()
+import app.main
+print((time.perf_counter() - start) * 1000)
+print(','.join(sorted(set({HEAVY_MODULES!r}) & sys.modules.keys())))
+"""
+
+DEPARTMENTS_CSV = b"".join(f"{i},Department {i}\n".encode() for i in range(1, 13))
+
+
+def server_env() -> dict:
+    env = dict(os.environ, DATABASE_URL=BENCH_DATABASE_URL, METRICS_CACHE_SIZE="0")
+    env.pop("ASYNC_DATABASE_URL", None)
+    return env
+
+
+def time_import(app_dir: str) -> tuple[float, str]:
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=app_dir, env=server_env(), capture_output=True, text=True, check=True
+    )
+    milliseconds, loaded = result.stdout.split('\n')[:2]
+    return float(milliseconds), loaded
+
+
+def time_server(app_dir: str, port: int, poll_ms: float, upload: bool) -> tuple[float, Optional[float]]:
+    """Milliseconds from spawning uvicorn to its first /health response, and then to its first upload"""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, env=server_env()
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline or server.poll() is not None:
+                    raise RuntimeError("API server did not start")
+                time.sleep(poll_ms / 1000)
+            first_response = (time.perf_counter() - start) * 1000
+
+            if not upload:
+                return first_response, None
+            start = time.perf_counter()
+            # Forced, so every run parses the file instead of matching the previous run's upload
+            response = client.post(
+                "/api/v1/upload/departments", params={'force': True},
+                files={"file": ("departments.csv", DEPARTMENTS_CSV, "text/csv")}
+            )
+            response.raise_for_status()
+            return first_response, (time.perf_counter() - start) * 1000
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--poll-ms', type=float, default=5)
+    parser.add_argument('--no-upload', action='store_true', help="Don't time the first upload (no database needed)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--app-dir', default=str(Path(__file__).resolve().parent.parent),
+                        help="Checkout whose app package is served (to compare commits)")
+    args = parser.parse_args()
+
+    if not args.no_upload:
+        reset_database(seed_reference=False)
+
+    timings = {'import': [], 'first_response': [], 'first_upload': []}
+    loaded = set()
+    for _ in range(args.runs):
+        milliseconds, modules = time_import(args.app_dir)
+        timings['import'].append(milliseconds)
+        loaded.update(filter(None, modules.split(',')))
+
+        first_response, first_upload = time_server(args.app_dir, args.port, args.poll_ms, not args.no_upload)
+        timings['first_response'].append(first_response)
+        if first_upload is not None:
+            timings['first_upload'].append(first_upload)
+
+    for name, samples in timings.items():
+        print(f"{name:<16} {format_latency(latency_summary(samples))}")
+    print(f"loaded by import: {', '.join(sorted(loaded)) or 'none of ' + ', '.join(HEAVY_MODULES)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark suite: every upload route and metrics endpoint of a live API.
+
+Generates a deterministic dataset (see bench.datagen), starts the API with
+uvicorn against BENCH_DATABASE_URL (wiped, metrics cache disabled) and runs:
+
+  upload_departments, upload_jobs, upload_employees
+      the generated files uploaded in that order, --repeats times on an
+      emptied database; rows/sec counts every row of the file
+  metrics_hiring_by_quarter, metrics_departments_above_average
+      --metrics-requests sequential requests after --warmup unmeasured ones;
+      rows/sec counts the rows returned
+
+Each scenario reports rows/sec, latency percentiles and the API process' peak
+RSS while it ran (Linux only; parse worker processes are not included).
+Write the report with --json and compare two of them, e.g. from two commits
+served with --app-dir:
+
+  BENCH_DATABASE_URL=postgresql://... python -m bench.suite --rows 1000000 --json before.json
+  BENCH_DATABASE_URL=postgresql://... python -m bench.suite --rows 1000000 --json after.json --app-dir ../other-checkout
+  python -m bench.suite --compare before.json after.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from bench.common import format_latency, latency_summary, peak_rss_mb, reset_database, reset_peak_rss, start_server
+from bench.datagen import DEFAULT_DEPARTMENTS, DEFAULT_JOBS, write_dataset
+
+UPLOAD_SCENARIOS = {
+    'upload_departments': ('departments', "/api/v1/upload/departments"),
+    'upload_jobs': ('jobs', "/api/v1/upload/jobs"),
+    'upload_employees': ('employees', "/api/v1/upload/employees"),
+}
+
+METRICS_SCENARIOS = {
+    'metrics_hiring_by_quarter': "/api/v1/metrics/hiring-by-quarter",
+    'metrics_departments_above_average': "/api/v1/metrics/departments-above-average",
+}
+
+
+def scenario_result(rows: int, seconds: float, timings: List[float], peak_mb: Optional[float], **extra) -> dict:
+    return {
+        'rows': rows,
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(rows / seconds, 1) if seconds else None,
+        'latency_ms': latency_summary(timings),
+        'peak_rss_mb': peak_mb,
+        **extra
+    }
+
+
+def measure(pid: int, run: Callable[[], None]) -> Optional[float]:
+    """Run and return the API process' peak RSS while it did"""
+    tracked = reset_peak_rss(pid)
+    run()
+    return peak_rss_mb(pid) if tracked else None
+
+
+def run_uploads(client: httpx.Client, pid: int, dataset: Dict[str, dict], args) -> Dict[str, dict]:
+    samples = {
+        name: {'timings': [], 'peaks': [], 'processed': 0, 'skipped': 0, 'rejected': Counter()}
+        for name in UPLOAD_SCENARIOS
+    }
+
+    for repeat in range(args.repeats):
+        if repeat:
+            reset_database(seed_reference=False)
+
+        for name, (kind, path) in UPLOAD_SCENARIOS.items():
+            sample = samples[name]
+            params = {'chunk_size': args.chunk_size, 'parse_workers': args.parse_workers} if kind == 'employees' else {}
+
+            def upload():
+                with open(dataset[kind]['path'], 'rb') as f:
+                    start = time.perf_counter()
+                    response = client.post(path, params=params, files={"file": (f"{kind}.csv", f, "text/csv")})
+                    sample['timings'].append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                body = response.json()
+                sample['processed'] += body['processed_rows']
+                sample['skipped'] += body['skipped_rows']
+                # Not reported by older commits
+                sample['rejected'].update(body.get('rejected_rows', {}))
+
+            sample['peaks'].append(measure(pid, upload))
+
+    results = {}
+    for name, (kind, _) in UPLOAD_SCENARIOS.items():
+        sample = samples[name]
+        peaks = [peak for peak in sample['peaks'] if peak is not None]
+        results[name] = scenario_result(
+            dataset[kind]['rows'] * args.repeats, sum(sample['timings']) / 1000, sample['timings'],
+            max(peaks) if peaks else None,
+            processed_rows=sample['processed'] // args.repeats,
+            skipped_rows=sample['skipped'] // args.repeats,
+            rejected_rows={reason: count // args.repeats for reason, count in sample['rejected'].items()},
+            invalid_rows=dataset[kind]['invalid_rows']
+        )
+    return results
+
+
+def run_metrics(client: httpx.Client, pid: int, args) -> Dict[str, dict]:
+    results = {}
+    for name, path in METRICS_SCENARIOS.items():
+        for _ in range(args.warmup):
+            client.get(path).raise_for_status()
+
+        timings = []
+        returned = [0]
+
+        def run_requests():
+            for _ in range(args.metrics_requests):
+                start = time.perf_counter()
+                response = client.get(path)
+                timings.append((time.perf_counter() - start) * 1000)
+                response.raise_for_status()
+                returned[0] += len(response.json())
+
+        peak = measure(pid, run_requests)
+        results[name] = scenario_result(returned[0], sum(timings) / 1000, timings, peak)
+    return results
+
+
+def git_commit(app_dir: str) -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=app_dir, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict):
+    print(f"commit {report['commit'] or 'unknown'}  {report['config']['rows']:,} employee rows")
+    for name, result in report['scenarios'].items():
+        rate = f"{result['rows_per_sec']:>12,.0f}" if result['rows_per_sec'] is not None else f"{'-':>12}"
+        peak = f"{result['peak_rss_mb']:8.1f} MB" if result['peak_rss_mb'] is not None else f"{'-':>8}"
+        print(f"{name:<35} {rate} rows/sec  peak {peak}  {format_latency(result['latency_ms'])}")
+
+
+def compare_reports(before_path: str, after_path: str):
+    """Print the rows/sec ratio and p95 change of each scenario in both reports"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    print(f"before {before['commit'] or before_path}\nafter  {after['commit'] or after_path}")
+    for name, old in before['scenarios'].items():
+        new = after['scenarios'].get(name)
+        if new is None:
+            continue
+        speedup = f"{new['rows_per_sec'] / old['rows_per_sec']:6.2f}x" \
+            if old['rows_per_sec'] and new['rows_per_sec'] else f"{'-':>7}"
+        old_p95, new_p95 = old['latency_ms'].get('p95'), new['latency_ms'].get('p95')
+        print(f"{name:<35} rows/sec {speedup}  p95 {old_p95} -> {new_p95} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000, help="Employee rows, 10k to 10M")
+    parser.add_argument('--departments', type=int, default=DEFAULT_DEPARTMENTS)
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--null-ratio', type=float, default=0.01)
+    parser.add_argument('--invalid-ratio', type=float, default=0.001)
+    parser.add_argument('--repeats', type=int, default=1, help="Upload rounds, each on an emptied database")
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    parser.add_argument('--parse-workers', type=int, default=1)
+    parser.add_argument('--metrics-requests', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--app-dir', default=str(Path(__file__).resolve().parent.parent),
+                        help="Checkout whose app package is served (to compare commits)")
+    parser.add_argument('--data-dir', type=Path, help="Keep the generated files here instead of a temporary directory")
+    parser.add_argument('--json', dest='json_path', help="Write the report to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two JSON reports and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or Path(tmp)
+        print(f"Generating {args.rows:,} employee rows in {data_dir}...")
+        dataset = write_dataset(
+            data_dir, args.rows, args.seed, args.null_ratio, args.invalid_ratio, args.departments, args.jobs
+        )
+
+        reset_database(seed_reference=False)
+        server = start_server(args.app_dir, args.port)
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{args.port}", timeout=3600) as client:
+                scenarios = run_uploads(client, server.pid, dataset, args)
+                scenarios.update(run_metrics(client, server.pid, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    config = {key: value for key, value in vars(args).items() if key not in ('json_path', 'compare', 'data_dir')}
+    report = {
+        'commit': git_commit(args.app_dir),
+        'created_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'config': config,
+        'scenarios': scenarios,
+    }
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
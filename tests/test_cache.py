@@ -0,0 +1,101 @@
+from io import BytesIO
+from fastapi.testclient import TestClient
+from app.cache import TTLCache
+from app.data_version import bump_data_version, data_version
+from app.models import DataVersion
+
+def test_cache_lru_eviction():
+    """Test least recently used entries are evicted past maxsize"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (3, 1, 1)
+
+def test_cache_ttl_expiry():
+    """Test entries older than ttl are treated as misses"""
+    cache = TTLCache(maxsize=2, ttl=0)
+    cache.set('a', [])
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+def test_metrics_cache_invalidated_by_upload(client: TestClient):
+    """Test metrics are served from cache until an upload commits rows"""
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(b"1,Engineering"), "text/csv")})
+    client.post("/api/v1/upload/jobs", files={"file": ("jobs.csv", BytesIO(b"1,Software Engineer"), "text/csv")})
+    before = client.get("/api/v1/metrics/internal/cache").json()
+
+    assert client.get("/api/v1/metrics/hiring-by-quarter").json() == []
+    assert client.get("/api/v1/metrics/hiring-by-quarter").json() == []
+    stats = client.get("/api/v1/metrics/internal/cache").json()
+    assert stats['hits'] - before['hits'] == 1
+    assert stats['misses'] - before['misses'] == 1
+
+    csv_content = b"1,John Doe,2021-01-15T10:00:00Z,1,1"
+    client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")})
+    assert client.get("/api/v1/metrics/hiring-by-quarter").json()[0]["Q1"] == 1
+
+    # Re-uploading the same rows commits nothing new and keeps the cache warm
+    client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")})
+    invalidations = client.get("/api/v1/metrics/internal/cache").json()['invalidations']
+    assert invalidations - stats['invalidations'] == 1
+
+def test_metrics_conditional_requests(client: TestClient):
+    """Test metrics carry the data version and unchanged data is answered with 304"""
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(b"1,Engineering"), "text/csv")})
+    response = client.get("/api/v1/metrics/hiring-by-quarter")
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+
+    response = client.get("/api/v1/metrics/departments-above-average", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get("/api/v1/metrics/hiring-by-quarter", headers={"If-Modified-Since": response.headers["last-modified"]})
+    assert response.status_code == 304
+
+    # A committing upload bumps the version; one that changes nothing does not
+    client.post("/api/v1/upload/jobs", files={"file": ("jobs.csv", BytesIO(b"1,Software Engineer"), "text/csv")})
+    response = client.get("/api/v1/metrics/hiring-by-quarter", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    new_etag = response.headers["etag"]
+    assert new_etag != etag
+
+    client.post("/api/v1/upload/jobs", files={"file": ("jobs.csv", BytesIO(b"1,Software Engineer"), "text/csv")})
+    assert client.get("/api/v1/metrics/hiring-by-quarter", headers={"If-None-Match": new_etag}).status_code == 304
+
+def test_data_version_persisted(client: TestClient, test_db):
+    """Test the version is stored in the database and reloaded by a fresh process"""
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(b"1,Engineering"), "text/csv")})
+    etag = client.get("/api/v1/metrics/hiring-by-quarter").headers["etag"]
+    assert test_db.get(DataVersion, 1).version == int(etag.strip('"v'))
+
+    # Simulate a restart: the in-memory copy is reloaded from data_version
+    data_version.reset()
+    assert client.get("/api/v1/metrics/hiring-by-quarter", headers={"If-None-Match": etag}).status_code == 304
+
+def test_data_version_refreshed_from_database(client: TestClient, test_db, monkeypatch):
+    """Test versions committed by other processes reach ETags once the refresh interval passes"""
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(b"1,Engineering"), "text/csv")})
+    etag = client.get("/api/v1/metrics/hiring-by-quarter").headers["etag"]
+    invalidations = client.get("/api/v1/metrics/internal/cache").json()['invalidations']
+
+    # Committed by another worker or `python -m app.rollup rebuild`, never published here
+    bump_data_version(test_db)
+    test_db.commit()
+
+    monkeypatch.setattr(data_version, 'refresh_seconds', 60)
+    assert client.get("/api/v1/metrics/hiring-by-quarter", headers={"If-None-Match": etag}).status_code == 304
+
+    monkeypatch.setattr(data_version, 'refresh_seconds', 0)
+    response = client.get("/api/v1/metrics/hiring-by-quarter", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"v{test_db.get(DataVersion, 1).version}"'
+    assert client.get("/api/v1/metrics/internal/cache").json()['invalidations'] == invalidations + 1
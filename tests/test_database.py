@@ -0,0 +1,64 @@
+import sqlite3
+import subprocess
+import sys
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session
+from app.migrate import create_schema, missing_tables
+from app.pool import InstrumentedQueuePool
+
+def test_pool_records_checkouts_and_timeouts():
+    """Test checkouts are timed and exhausted checkouts counted as waits and timeouts"""
+    pool = InstrumentedQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=1, max_overflow=0, timeout=0.01)
+    first = pool.connect()
+    with pytest.raises(exc.TimeoutError):
+        pool.connect()
+
+    report = pool.report()
+    assert (report['checked_out'], report['checked_in']) == (1, 0)
+    assert (report['checkouts'], report['waits'], report['timeouts']) == (1, 1, 1)
+    assert report['wait_seconds'] >= 0.01
+
+    first.close()
+    pool.connect().close()
+    report = pool.report()
+    assert (report['checked_out'], report['checked_in']) == (0, 1)
+    assert report['checkouts'] == 2
+    assert report['checkout_latency_ms']['+Inf'] == 2
+
+def test_statement_timeout_applied_per_transaction(test_db: Session):
+    """Test sessions carrying statement_timeout_ms cancel slow statements"""
+    test_db.info['statement_timeout_ms'] = 50
+    with pytest.raises(exc.OperationalError):
+        test_db.execute(text("SELECT pg_sleep(1)"))
+    test_db.rollback()
+
+    # The next transaction sets the timeout again
+    assert test_db.execute(text("SHOW statement_timeout")).scalar_one() == '50ms'
+
+def test_pool_stats_endpoint(client: TestClient):
+    """Test pool statistics are exposed next to the cache statistics"""
+    response = client.get("/api/v1/metrics/internal/pool")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data['checked_out'] >= 0
+    assert list(data['checkout_latency_ms'])[-1] == '+Inf'
+
+def test_app_import_defers_heavy_modules():
+    """Test importing the app neither loads pandas nor connects to the database"""
+    code = (
+        "import sys\n"
+        "from unittest import mock\n"
+        "with mock.patch('sqlalchemy.engine.Engine.connect', side_effect=AssertionError('connected')):\n"
+        "    import app.main\n"
+        "print(sorted({'pandas', 'numpy', 'pyarrow'} & sys.modules.keys()))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == "[]"
+
+def test_migrate_creates_missing_tables(test_engine):
+    """Test the schema migration only reports the tables it had to create"""
+    assert missing_tables(test_engine) == []
+    assert create_schema(test_engine) == []
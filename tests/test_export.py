@@ -0,0 +1,59 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pandas as pd
+from io import BytesIO
+from fastapi.testclient import TestClient
+from app.export import ChunkSink, open_writer, encode_rows, close_writer
+
+def upload_hires(client: TestClient):
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(b"1,Engineering\n2,Sales"), "text/csv")})
+    client.post("/api/v1/upload/jobs", files={"file": ("jobs.csv", BytesIO(b"1,Software Engineer\n2,Manager"), "text/csv")})
+    csv_content = b"""1,John Doe,2021-01-15T10:00:00Z,1,1
+2,Jane Smith,2021-05-20T11:00:00Z,1,2
+3,Bob Johnson,2021-08-10T12:00:00Z,2,2
+4,Alice Brown,2022-02-01T09:00:00Z,2,1
+5,Eve Miller,2021-03-03T08:00:00Z,,"""
+    client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")})
+
+def test_parquet_written_in_drained_chunks():
+    """Test a Parquet file assembled from drained chunks is readable"""
+    schema = pa.schema([('id', pa.int32()), ('name', pa.string())])
+    sink = ChunkSink()
+    writer = open_writer(sink, schema, 'parquet')
+    chunks = [encode_rows(writer, sink, schema, [(1, 'a'), (2, 'b')]), encode_rows(writer, sink, schema, [(3, 'c')])]
+    chunks.append(close_writer(writer, sink))
+
+    table = pq.read_table(BytesIO(b''.join(chunks)))
+    assert table.column('id').to_pylist() == [1, 2, 3]
+    assert pq.ParquetFile(BytesIO(b''.join(chunks))).num_row_groups == 2
+
+def test_export_hires_formats(client: TestClient):
+    """Test raw hires export in every format with year and department filters"""
+    upload_hires(client)
+
+    response = client.get("/api/v1/export/hires", params={"format": "parquet"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    hires = pd.read_parquet(BytesIO(response.content))
+    assert hires['id'].tolist() == [1, 5, 2, 3]
+    assert hires['department'].tolist() == ['Engineering', None, 'Engineering', 'Sales']
+
+    response = client.get("/api/v1/export/hires", params={"format": "arrow", "year": 2022})
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column('job').to_pylist() == ['Software Engineer']
+
+    response = client.get("/api/v1/export/hires", params={"format": "csv", "department_id": 1})
+    assert response.headers["content-disposition"] == 'attachment; filename="hires.csv"'
+    assert pd.read_csv(BytesIO(response.content))['name'].tolist() == ['John Doe', 'Jane Smith']
+
+def test_export_metrics(client: TestClient):
+    """Test metrics exports match the JSON endpoints"""
+    upload_hires(client)
+
+    by_quarter = pd.read_parquet(BytesIO(client.get("/api/v1/export/metrics/hiring-by-quarter").content))
+    assert by_quarter.to_dict('records') == client.get("/api/v1/metrics/hiring-by-quarter").json()
+
+    response = client.get("/api/v1/export/metrics/departments-above-average", params={"format": "csv"})
+    above_average = pd.read_csv(BytesIO(response.content))
+    assert above_average[['id', 'department', 'hired']].to_dict('records') == [{'id': 1, 'department': 'Engineering', 'hired': 2}]
+    assert above_average['mean_hired'].tolist() == [1.5]
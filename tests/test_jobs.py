@@ -0,0 +1,73 @@
+import gzip
+import time
+import pytest
+from io import BytesIO
+from fastapi.testclient import TestClient
+
+def wait_for_job(client: TestClient, status_url: str, timeout: float = 10.0) -> dict:
+    """Poll a job status URL until the job finishes"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = client.get(status_url).json()
+        if data["status"] in ("completed", "failed"):
+            return data
+        time.sleep(0.05)
+    pytest.fail(f"Job at {status_url} did not finish in {timeout}s")
+
+def test_background_employees_upload(client: TestClient):
+    """Test employees upload queued as a job reports progress when polled"""
+    reference = {
+        "departments": "1,Engineering\n2,Sales",
+        "jobs": "1,Software Engineer\n2,Data Analyst",
+    }
+    for endpoint, csv_content in reference.items():
+        files = {"file": (f"{endpoint}.csv", BytesIO(csv_content.encode()), "text/csv")}
+        response = client.post(f"/api/v1/upload/{endpoint}", params={"background": True}, files=files)
+        assert response.status_code == 202
+        assert wait_for_job(client, response.json()["status_url"])["status"] == "completed"
+
+    csv_content = """1,John Doe,2021-01-15T10:00:00Z,1,1
+2,Jane Smith,2021-02-20T11:00:00Z,2,2
+3,Bob Johnson,2021-03-10T12:00:00Z,1,2"""
+    files = {"file": ("employees.csv", BytesIO(csv_content.encode()), "text/csv")}
+
+    response = client.post("/api/v1/upload/employees", params={"background": True, "chunk_size": 2}, files=files)
+    assert response.status_code == 202
+    accepted = response.json()
+    assert accepted["status_url"] == f"/api/v1/jobs/{accepted['job_id']}"
+
+    data = wait_for_job(client, accepted["status_url"])
+    assert data["status"] == "completed"
+    assert data["kind"] == "employees"
+    assert data["rows_parsed"] == 3
+    assert data["inserted_rows"] == 3
+    assert data["skipped_rows"] == 0
+    assert data["errors"] == []
+    assert data["rows_per_second"] > 0
+
+def test_background_compressed_upload(client: TestClient):
+    """Test a gzip upload is spooled compressed and decompressed by the job"""
+    files = {"file": ("departments.csv.gz", BytesIO(gzip.compress(b"1,Engineering\n2,Sales")), "application/gzip")}
+
+    response = client.post("/api/v1/upload/departments", params={"background": True}, files=files)
+    assert response.status_code == 202
+
+    data = wait_for_job(client, response.json()["status_url"])
+    assert data["status"] == "completed"
+    assert data["inserted_rows"] == 2
+
+def test_background_upload_failure(client: TestClient):
+    """Test a job whose file cannot be parsed is reported as failed"""
+    files = {"file": ("employees.csv", BytesIO(b'1,"unterminated\n'), "text/csv")}
+
+    response = client.post("/api/v1/upload/employees", params={"background": True}, files=files)
+    assert response.status_code == 202
+
+    data = wait_for_job(client, response.json()["status_url"])
+    assert data["status"] == "failed"
+    assert data["message"] == "Invalid employees CSV format"
+
+def test_unknown_job(client: TestClient):
+    """Test polling a job id that does not exist"""
+    response = client.get("/api/v1/jobs/does-not-exist")
+    assert response.status_code == 404
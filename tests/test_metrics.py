@@ -1,7 +1,12 @@
+import json
 import pytest
+from io import BytesIO
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
-from app.models import Department, Job, Employee
+from app.models import Department, Job, Employee, HiringRollup
+from app.partitions import ensure_year_partitions
+from app.rollup import rebuild_rollup, check_rollup_consistency, raw_hires_query
+from sqlalchemy import text
 from datetime import datetime
 
 @pytest.fixture
@@ -33,6 +38,9 @@ def setup_test_data(test_db: Session):
     test_db.add_all(employees)
     test_db.commit()
 
+    # Employees were inserted directly rather than through an upload
+    rebuild_rollup(test_db)
+
 def test_hiring_by_quarter(client: TestClient, setup_test_data):
     """Test hiring by quarter endpoint"""
     response = client.get("/api/v1/metrics/hiring-by-quarter")
@@ -81,6 +89,72 @@ def test_departments_above_average(client: TestClient, setup_test_data):
         for i in range(len(data) - 1):
             assert data[i]["hired"] >= data[i + 1]["hired"]
 
+def test_hiring_by_quarter_filters(client: TestClient, setup_test_data):
+    """Test year, year range, quarter and department/job filters"""
+    data = client.get("/api/v1/metrics/hiring-by-quarter", params={"year": 2022}).json()
+    assert data == [{"department": "Engineering", "job": "Software Engineer", "Q1": 1, "Q2": 0, "Q3": 0, "Q4": 0}]
+
+    data = client.get("/api/v1/metrics/hiring-by-quarter", params={"start_year": 2021, "end_year": 2022, "job_id": 1}).json()
+    assert data == [{"department": "Engineering", "job": "Software Engineer", "Q1": 3, "Q2": 0, "Q3": 0, "Q4": 0}]
+
+    data = client.get("/api/v1/metrics/hiring-by-quarter", params={"quarter": 4}).json()
+    assert data == [{"department": "Marketing", "job": "Marketing Specialist", "Q1": 0, "Q2": 0, "Q3": 0, "Q4": 2}]
+
+    data = client.get("/api/v1/metrics/hiring-by-quarter", params={"department_id": 2}).json()
+    assert [row["department"] for row in data] == ["Sales"]
+
+    assert client.get("/api/v1/metrics/hiring-by-quarter", params={"year": 2020}).json() == []
+
+def test_departments_above_average_filters(client: TestClient, setup_test_data):
+    """Test filters on departments above average"""
+    # 2022: Engineering 1, Sales 0, Marketing 0 -> mean 1/3
+    data = client.get("/api/v1/metrics/departments-above-average", params={"year": 2022}).json()
+    assert data == [{"id": 1, "department": "Engineering", "hired": 1}]
+
+    # 2021 Q4: only Marketing hired
+    data = client.get("/api/v1/metrics/departments-above-average", params={"quarter": 4}).json()
+    assert data == [{"id": 3, "department": "Marketing", "hired": 2}]
+
+    data = client.get("/api/v1/metrics/departments-above-average", params={"year": 2022, "department_id": 2}).json()
+    assert data == []
+
+def test_departments_above_average_mean(client: TestClient, setup_test_data):
+    """Test the mean used for the comparison can be returned with the rows"""
+    # 2021: Engineering 2, Sales 2, Marketing 2 -> nobody above the mean
+    assert client.get("/api/v1/metrics/departments-above-average").json() == []
+
+    data = client.get("/api/v1/metrics/departments-above-average", params={"year": 2022, "include_mean": True}).json()
+    assert data == [{"id": 1, "department": "Engineering", "hired": 1, "mean_hired": pytest.approx(1 / 3)}]
+
+def test_metrics_streamed_responses(client: TestClient, setup_test_data):
+    """Test json and ndjson streams carry the same rows as the regular responses"""
+    expected = client.get("/api/v1/metrics/hiring-by-quarter").json()
+    response = client.get("/api/v1/metrics/hiring-by-quarter", params={"stream": "json"})
+    assert response.headers["content-type"] == "application/json"
+    assert response.json() == expected
+
+    response = client.get("/api/v1/metrics/hiring-by-quarter", params={"stream": "ndjson"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+    params = {"year": 2022, "include_mean": True}
+    expected = client.get("/api/v1/metrics/departments-above-average", params=params).json()
+    assert client.get("/api/v1/metrics/departments-above-average", params={**params, "stream": "json"}).json() == expected
+
+    empty = client.get("/api/v1/metrics/departments-above-average", params={"stream": "json"})
+    assert empty.json() == []
+
+def test_metrics_invalid_filters(client: TestClient):
+    """Test conflicting or out of range filters are rejected"""
+    response = client.get("/api/v1/metrics/hiring-by-quarter", params={"year": 2021, "start_year": 2020})
+    assert response.status_code == 400
+
+    response = client.get("/api/v1/metrics/departments-above-average", params={"start_year": 2022, "end_year": 2021})
+    assert response.status_code == 400
+
+    response = client.get("/api/v1/metrics/hiring-by-quarter", params={"quarter": 5})
+    assert response.status_code == 422
+
 def test_empty_database_metrics(client: TestClient):
     """Test metrics endpoints with empty database"""
     response = client.get("/api/v1/metrics/hiring-by-quarter")
@@ -91,6 +165,89 @@ def test_empty_database_metrics(client: TestClient):
     assert response.status_code == 200
     assert response.json() == []
 
+def test_rollup_maintained_on_upload(client: TestClient, test_db: Session):
+    """Test employee uploads increment the hiring rollup served by the metrics"""
+    uploads = [
+        ("departments", "1,Engineering\n2,Sales"),
+        ("jobs", "1,Software Engineer\n2,Sales Manager"),
+        ("employees", "1,John Doe,2021-01-15T10:00:00Z,1,1\n2,Jane Smith,2021-02-20T11:00:00Z,1,1\n3,Bob Johnson,2021-04-10T12:00:00Z,2,"),
+        ("employees", "3,Bob Johnson,2021-04-10T12:00:00Z,2,\n4,Alice Brown,2021-05-05T09:00:00Z,1,1"),
+    ]
+    for endpoint, csv_content in uploads:
+        files = {"file": (f"{endpoint}.csv", BytesIO(csv_content.encode()), "text/csv")}
+        assert client.post(f"/api/v1/upload/{endpoint}", files=files).status_code == 200
+
+    assert check_rollup_consistency(test_db) == []
+    assert test_db.query(HiringRollup).filter_by(year=2021, quarter=2, department_id=2, job_id=None).one().hired == 1
+
+    data = client.get("/api/v1/metrics/hiring-by-quarter").json()
+    assert data == [{"department": "Engineering", "job": "Software Engineer", "Q1": 2, "Q2": 1, "Q3": 0, "Q4": 0}]
+
+    data = client.get("/api/v1/metrics/departments-above-average").json()
+    assert data == [{"id": 1, "department": "Engineering", "hired": 3}]
+
+def test_rollup_rebuild(test_db: Session, setup_test_data):
+    """Test consistency check detects drift and rebuild repairs it"""
+    assert check_rollup_consistency(test_db) == []
+
+    test_db.add(Employee(id=8, name="Frank Moore", datetime=datetime(2021, 12, 1), department_id=1, job_id=1))
+    test_db.commit()
+    assert check_rollup_consistency(test_db) == [
+        {'year': 2021, 'quarter': 4, 'department_id': 1, 'job_id': 1, 'raw': 1, 'rollup': 0}
+    ]
+
+    assert rebuild_rollup(test_db, 2021) == 5
+    assert check_rollup_consistency(test_db) == []
+    assert rebuild_rollup(test_db) == 6
+
+def test_yearly_hires_prune_to_one_partition(test_db: Session, test_engine):
+    """Test a yearly raw hires query only reads that year's partition"""
+    test_db.execute(text("""
+        INSERT INTO employees (id, name, datetime)
+        SELECT g, 'Employee ' || g, timestamp '2019-01-01' + g * interval '1 day'
+        FROM generate_series(1, 1500) g
+    """))
+    ensure_year_partitions(test_db, range(2019, 2024))
+    test_db.commit()
+    assert test_db.execute(text("SELECT count(*) FROM employees_default")).scalar_one() == 0
+
+    compiled = raw_hires_query(2021).compile(dialect=test_engine.dialect)
+    plan = "\n".join(
+        row[0] for row in test_db.connection().exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+    )
+    assert "employees_y2021" in plan
+    assert all(other not in plan for other in ("employees_y2020", "employees_y2022", "employees_default"))
+
+def test_yearly_hires_use_datetime_index(test_db: Session, test_engine):
+    """Test the yearly raw hires query can be answered from the year partition's idx_employee_datetime"""
+    # ~60k employees hired every 3 hours from 2010 onwards, about 5% of them in 2021
+    test_db.execute(text("""
+        INSERT INTO employees (id, name, datetime)
+        SELECT g, 'Employee ' || g, timestamp '2010-01-01' + g * interval '3 hours'
+        FROM generate_series(1, 60000) g
+    """))
+    ensure_year_partitions(test_db, [2021])
+    test_db.commit()
+    with test_engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE employees"))
+
+    index = test_db.execute(text("""
+        SELECT x.indexrelid::regclass::text FROM pg_index x JOIN pg_inherits i ON i.inhrelid = x.indexrelid
+        WHERE i.inhparent = 'idx_employee_datetime'::regclass AND x.indrelid = 'employees_y2021'::regclass
+    """)).scalar_one()
+
+    # Every row of the partition matches the year, so the planner may rightly
+    # prefer reading it sequentially; check the covering index can answer alone
+    test_db.execute(text("SET LOCAL enable_seqscan = off"))
+    test_db.execute(text("SET LOCAL enable_bitmapscan = off"))
+    compiled = raw_hires_query(2021).compile(dialect=test_engine.dialect)
+    plan = "\n".join(
+        row[0] for row in test_db.connection().exec_driver_sql(f"EXPLAIN {compiled}", compiled.params)
+    )
+
+    assert f"Index Only Scan using {index} on employees_y2021" in plan
+    assert "employees_default" not in plan
+
 def test_health_check(client: TestClient):
     """Test health check endpoint"""
     response = client.get("/health")
@@ -0,0 +1,63 @@
+from io import BytesIO
+from fastapi.testclient import TestClient
+from app import timing
+from app.timing import RequestTimings, current_timings, timed
+
+def server_timing_metrics(response) -> dict:
+    """Server-Timing header as {name: [params]}"""
+    metrics = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, *params = entry.split(";")
+        metrics[name] = params
+    return metrics
+
+def test_timed_is_noop_outside_requests():
+    """Test stages outside a request are not recorded anywhere"""
+    assert current_timings.get() is None
+    with timed('parse'):
+        pass
+
+    timings = RequestTimings()
+    token = current_timings.set(timings)
+    try:
+        with timed('parse'):
+            pass
+        with timed('parse'):
+            pass
+    finally:
+        current_timings.reset(token)
+    assert list(timings.stages) == ['parse']
+
+def test_upload_reports_stage_timings(client: TestClient):
+    """Test employee uploads report parse, validate, write and commit stages"""
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(b"1,Engineering\n2,Sales"), "text/csv")})
+    client.post("/api/v1/upload/jobs", files={"file": ("jobs.csv", BytesIO(b"1,Engineer\n2,Analyst"), "text/csv")})
+    csv_content = "1,John Doe,2021-01-15T10:00:00Z,1,1\n2,Jane Smith,2021-02-20T11:00:00Z,2,2"
+    files = {"file": ("employees.csv", BytesIO(csv_content.encode()), "text/csv")}
+
+    response = client.post("/api/v1/upload/employees", files=files)
+    assert response.status_code == 200
+
+    metrics = server_timing_metrics(response)
+    assert {'parse', 'validate', 'write', 'commit', 'total'} <= metrics.keys()
+    assert metrics['total'][0].startswith('dur=')
+
+def test_metrics_report_query_timings(client: TestClient):
+    """Test metrics responses list the time of each SQL statement"""
+    response = client.get("/api/v1/metrics/hiring-by-quarter?year=2019")
+    assert response.status_code == 200
+
+    metrics = server_timing_metrics(response)
+    assert metrics['db'][1].endswith('queries"')
+    assert 'db1' in metrics
+
+def test_profile_mode(client: TestClient, monkeypatch):
+    """Test ?profile=1 returns a cProfile report only when profiling is enabled"""
+    response = client.get("/health?profile=1")
+    assert response.json() == {"status": "healthy"}
+
+    monkeypatch.setattr(timing, 'REQUEST_PROFILING', True)
+    response = client.get("/health?profile=1")
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+    assert "function calls" in response.text
@@ -1,6 +1,30 @@
+import gzip
+import threading
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pyarrow as pa
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.compression import compressed_format, detect_compression, open_decompressed
+from app.csv_processor import CSVProcessor
+from app.models import Base, Employee
+from app.partitions import detach_year_partition, year_partitions
+from app.reference_index import ReferenceIds
+from app.rejects import ErrorSummary
+from app.rollup import check_rollup_consistency
+
+@pytest.fixture
+def reference_data(client: TestClient):
+    """Upload departments and jobs referenced by the employee fixtures"""
+    departments = "1,Engineering\n2,Sales"
+    jobs = "1,Software Engineer\n2,Data Analyst\n3,Manager"
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(departments.encode()), "text/csv")})
+    client.post("/api/v1/upload/jobs", files={"file": ("jobs.csv", BytesIO(jobs.encode()), "text/csv")})
 
 def test_upload_departments_csv(client: TestClient):
     """Test departments CSV upload"""
@@ -30,7 +54,7 @@ def test_upload_jobs_csv(client: TestClient):
     assert data["processed_rows"] == 3
     assert "Jobs uploaded successfully" in data["message"]
 
-def test_upload_employees_csv(client: TestClient):
+def test_upload_employees_csv(client: TestClient, reference_data):
     """Test employees CSV upload"""
     csv_content = """1,John Doe,2021-01-15T10:00:00Z,1,1
 2,Jane Smith,2021-02-20T11:00:00Z,2,2
@@ -42,15 +66,221 @@ def test_upload_employees_csv(client: TestClient):
     assert response.status_code == 200
     data = response.json()
     assert data["processed_rows"] == 3
+    assert data["skipped_rows"] == 0
     assert "Employees uploaded successfully" in data["message"]
 
+def test_upload_employees_csv_chunked(client: TestClient, reference_data):
+    """Test employees CSV is streamed and written in chunk_size batches"""
+    csv_content = """1,John Doe,2021-01-15T10:00:00Z,1,1
+2,Jane Smith,2021-02-20T11:00:00Z,2,2
+3,Bob Johnson,2021-03-10T12:00:00Z,1,3"""
+
+    files = {"file": ("employees.csv", BytesIO(csv_content.encode()), "text/csv")}
+
+    response = client.post("/api/v1/upload/employees", params={"chunk_size": 2}, files=files)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["processed_rows"] == 3
+    assert "in 2 batches" in data["message"]
+
+def test_upload_duplicate_employees(client: TestClient, reference_data):
+    """Test re-uploaded rows are skipped as unchanged, or as existing ids when modified"""
+    csv_content = """1,John Doe,2021-01-15T10:00:00Z,1,1
+2,Jane Smith,2021-02-20T11:00:00Z,2,2"""
+    files = {"file": ("employees.csv", BytesIO(csv_content.encode()), "text/csv")}
+    client.post("/api/v1/upload/employees", files=files)
+
+    changed = csv_content.replace("Jane Smith", "Jane Doe") + "\n3,Bob Johnson,2021-03-10T12:00:00Z,1,3"
+    files = {"file": ("employees.csv", BytesIO(changed.encode()), "text/csv")}
+    response = client.post("/api/v1/upload/employees", files=files)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["processed_rows"] == 1
+    assert data["skipped_rows"] == 1
+    assert data["unchanged_rows"] == 1
+    assert data["errors"] == []
+
+def test_upload_identical_employees_file(client: TestClient, reference_data):
+    """Test resending the last employees file is answered from the upload ledger unless forced"""
+    csv_content = b"1,John Doe,2021-01-15T10:00:00Z,1,1\n2,Jane Smith,2021-02-20T11:00:00Z,2,2"
+    client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")})
+
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert "identical to the last upload" in data["message"]
+    assert (data["processed_rows"], data["unchanged_rows"]) == (0, 2)
+
+    data = client.post(
+        "/api/v1/upload/employees", params={"force": True},
+        files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}
+    ).json()
+    assert (data["processed_rows"], data["skipped_rows"], data["unchanged_rows"]) == (0, 2, 0)
+
+def test_upload_identical_employees_file_with_rejects(client: TestClient, reference_data):
+    """Test a resent employees file is parsed again when it had rejected rows"""
+    csv_content = b"1,John Doe,2021-01-15T10:00:00Z,1,1\n2,Jane Smith,2021-02-20T11:00:00Z,3,2"
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert data["rejected_rows"] == {"unknown_department": 1}
+
+    departments = b"1,Engineering\n2,Sales\n3,Marketing"
+    client.post("/api/v1/upload/departments", files={"file": ("departments.csv", BytesIO(departments), "text/csv")})
+
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert "identical" not in data["message"]
+    assert (data["processed_rows"], data["unchanged_rows"], data["rejected_rows"]) == (1, 1, {})
+
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert "identical to the last upload" in data["message"]
+    assert (data["processed_rows"], data["unchanged_rows"]) == (0, 2)
+
+def test_upload_identical_departments_file(client: TestClient):
+    """Test only a resend of the last departments file with the same mode is short-circuited"""
+    def upload(csv_content, mode="skip"):
+        files = {"file": ("departments.csv", BytesIO(csv_content), "text/csv")}
+        return client.post("/api/v1/upload/departments", params={"mode": mode}, files=files).json()
+
+    upload(b"1,Engineering")
+    assert "identical" in upload(b"1,Engineering")["message"]
+    assert "identical" not in upload(b"1,Engineering", "update")["message"]
+
+    # A, then B, then A again reapplies A
+    upload(b"1,Research", "update")
+    assert upload(b"1,Engineering", "update")["updated_rows"] == 1
+
+def test_upload_employees_unknown_reference(client: TestClient, reference_data):
+    """Test employees pointing at missing departments/jobs are rejected without aborting the batch"""
+    csv_content = """1,John Doe,2021-01-15T10:00:00Z,1,1
+2,Jane Smith,2021-02-20T11:00:00Z,9,2
+3,Bob Johnson,2021-03-10T12:00:00Z,1,"""
+
+    files = {"file": ("employees.csv", BytesIO(csv_content.encode()), "text/csv")}
+    response = client.post("/api/v1/upload/employees", files=files)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["processed_rows"] == 2
+    assert data["skipped_rows"] == 0
+    assert data["rejected_rows"] == {"unknown_department": 1}
+    assert data["errors"] == []
+
+def test_upload_employees_rejects_file(client: TestClient, reference_data):
+    """Test rejected rows are sampled in the response and downloadable with their line and reason"""
+    csv_content = """1,John Doe,2021-01-15T10:00:00Z,1,1
+2,,2021-02-20T11:00:00Z,2,2
+3,Bob Johnson,2021-03-10T12:00:00Z,1,1
+4,Alice Brown,2021-04-10T12:00:00Z,9,1
+x,Eve Miller,2021-05-01T08:30:00Z,1,1"""
+
+    files = {"file": ("employees.csv", BytesIO(csv_content.encode()), "text/csv")}
+    data = client.post("/api/v1/upload/employees", params={"chunk_size": 2}, files=files).json()
+    assert data["processed_rows"] == 2
+    assert data["rejected_rows"] == {"missing_name": 1, "unknown_department": 1, "invalid_id": 1}
+    assert [(row["line"], row["reason"]) for row in data["rejected_sample"]] == [
+        (2, "missing_name"), (4, "unknown_department"), (5, "invalid_id")
+    ]
+    assert data["rejected_sample"][1]["values"]["department_id"] == "9"
+    assert data["rejects_url"] == f"/api/v1/uploads/{data['upload_id']}/rejects"
+
+    response = client.get(data["rejects_url"])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == [
+        "line,reason,id,name,datetime,department_id,job_id",
+        "2,missing_name,2,,2021-02-20T11:00:00Z,2,2",
+        "4,unknown_department,4,Alice Brown,2021-04-10T12:00:00Z,9,1",
+        "5,invalid_id,x,Eve Miller,2021-05-01T08:30:00Z,1,1",
+    ]
+
+    files = {"file": ("employees.csv", BytesIO(b"6,Frank Moore,2021-06-01T08:30:00Z,1,1"), "text/csv")}
+    data = client.post("/api/v1/upload/employees", files=files).json()
+    assert data["rejects_url"] is None
+    assert client.get(f"/api/v1/uploads/{data['upload_id']}/rejects").status_code == 404
+    assert client.get("/api/v1/uploads/..%2F..%2Fetc%2Fpasswd/rejects").status_code == 404
+
+def test_parallel_parsing_keeps_line_numbers():
+    """Test rejects parsed in worker processes carry their line in the whole file"""
+    content = "".join(
+        f"{i},{'' if i % 50 == 0 else f'Employee {i}'},2021-01-01T10:00:00Z,1,1\n" for i in range(1, 201)
+    ).encode()
+
+    batches = CSVProcessor.iter_employee_batches_parallel(BytesIO(content), 16, workers=2, chunk_bytes=512)
+    lines = [line for batch in batches if 'rejects' in batch.attrs for line in batch.attrs['rejects']['line']]
+    assert lines == [50, 100, 150, 200]
+
+def test_blank_lines_keep_line_numbers():
+    """Test rows after blank lines are reported at their line in the file"""
+    rows = [f"{i},{'' if i % 50 == 0 else f'Employee {i}'},2021-01-01T10:00:00Z,1,1\n" for i in range(1, 201)]
+    content = "".join(row if i != 30 else "\n" for i, row in enumerate(rows, 1)).encode()
+
+    sequential = CSVProcessor.iter_employee_batches(BytesIO(content), 16)
+    parallel = CSVProcessor.iter_employee_batches_parallel(BytesIO(content), 16, workers=2, chunk_bytes=512)
+    for batches in (sequential, parallel):
+        batches = list(batches)
+        lines = [line for batch in batches if 'rejects' in batch.attrs for line in batch.attrs['rejects']['line']]
+        assert lines == [50, 100, 150, 200]
+        assert sum(len(batch) for batch in batches) == 195
+
+def test_error_summary_is_bounded():
+    """Test errors are counted per category while only the first messages are kept"""
+    errors = ErrorSummary(sample_size=3)
+    errors.add('database_error', ["batch 1 failed"], count=1000)
+    errors.add('database_error', [f"row {i} failed" for i in range(10)])
+    errors.add('still_referenced', [])
+
+    assert errors.counts == {'database_error': 1010}
+    assert errors.samples == ["batch 1 failed", "row 0 failed", "row 1 failed"]
+
+def test_upload_employees_new_department(client: TestClient, reference_data):
+    """Test departments uploaded after the reference index was loaded are accepted"""
+    files = {"file": ("employees.csv", BytesIO(b"1,John Doe,2021-01-15T10:00:00Z,1,1"), "text/csv")}
+    assert client.post("/api/v1/upload/employees", files=files).json()["processed_rows"] == 1
+
+    files = {"file": ("departments.csv", BytesIO(b"13,Research"), "text/csv")}
+    client.post("/api/v1/upload/departments", files=files)
+
+    files = {"file": ("employees.csv", BytesIO(b"2,Jane Smith,2021-02-20T11:00:00Z,13,2"), "text/csv")}
+    data = client.post("/api/v1/upload/employees", files=files).json()
+    assert data["processed_rows"] == 1
+    assert data["rejected_rows"] == {}
+
+def test_upload_employees_department_added_elsewhere(client: TestClient, reference_data, test_db):
+    """Test departments committed by another process are looked up before rows are rejected"""
+    files = {"file": ("employees.csv", BytesIO(b"1,John Doe,2021-01-15T10:00:00Z,1,1"), "text/csv")}
+    assert client.post("/api/v1/upload/employees", files=files).json()["processed_rows"] == 1
+
+    test_db.execute(text("INSERT INTO departments (id, department) VALUES (14, 'Legal')"))
+    test_db.commit()
+
+    csv_content = b"2,Jane Smith,2021-02-20T11:00:00Z,14,2\n3,Bob Johnson,2021-03-10T12:00:00Z,99,1"
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert data["processed_rows"] == 1
+    assert data["rejected_rows"] == {"unknown_department": 1}
+    assert [(row["line"], row["reason"]) for row in data["rejected_sample"]] == [(2, "unknown_department")]
+
+def test_upload_employees_department_removed_elsewhere(client: TestClient, reference_data, test_db):
+    """Test rows whose department was deleted after validation are rejected, not skipped, and retried on resend"""
+    files = {"file": ("employees.csv", BytesIO(b"1,John Doe,2021-01-15T10:00:00Z,1,1"), "text/csv")}
+    assert client.post("/api/v1/upload/employees", files=files).json()["processed_rows"] == 1
+
+    test_db.execute(text("DELETE FROM departments WHERE id = 2"))
+    test_db.commit()
+
+    csv_content = b"2,Jane Smith,2021-02-20T11:00:00Z,2,2"
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert (data["processed_rows"], data["skipped_rows"]) == (0, 0)
+    assert data["rejected_rows"] == {"unknown_department": 1}
+    assert [(row["line"], row["reason"]) for row in data["rejected_sample"]] == [(1, "unknown_department")]
+
+    test_db.execute(text("INSERT INTO departments (id, department) VALUES (2, 'Sales')"))
+    test_db.commit()
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert (data["processed_rows"], data["unchanged_rows"], data["rejected_rows"]) == (1, 0, {})
+
 def test_upload_invalid_csv_format(client: TestClient):
     """Test upload with invalid file format"""
     files = {"file": ("test.txt", BytesIO(b"test content"), "text/plain")}
 
     response = client.post("/api/v1/upload/departments", files=files)
     assert response.status_code == 400
-    assert "File must be CSV format" in response.json()["detail"]
+    assert "File must be CSV, Parquet or Arrow IPC format" in response.json()["detail"]
 
 def test_upload_malformed_csv(client: TestClient):
     """Test upload with malformed CSV"""
@@ -73,3 +303,259 @@ def test_upload_duplicate_departments(client: TestClient):
     assert response.status_code == 200
     data = response.json()
     assert data["processed_rows"] == 0  # No new records processed
+
+def test_upload_departments_modes(client: TestClient):
+    """Test skip, update and replace modes for changed department names"""
+    def upload(csv_content, mode):
+        files = {"file": ("departments.csv", BytesIO(csv_content.encode()), "text/csv")}
+        response = client.post("/api/v1/upload/departments", params={"mode": mode}, files=files)
+        assert response.status_code == 200
+        data = response.json()
+        return data["processed_rows"], data["updated_rows"], data["skipped_rows"], data["deleted_rows"], data["errors"]
+
+    assert upload("1,Engineering\n2,Sales\n3,Marketing", "skip") == (3, 0, 0, 0, [])
+    assert upload("1,Engineering\n2,Sales & Support\n4,Legal", "skip") == (1, 0, 2, 0, [])
+    assert upload("1,Engineering\n2,Sales & Support\n4,Legal", "update") == (0, 1, 2, 0, [])
+
+    jobs = {"file": ("jobs.csv", BytesIO(b"1,Manager"), "text/csv")}
+    client.post("/api/v1/upload/jobs", files=jobs)
+    employees = {"file": ("employees.csv", BytesIO(b"1,John Doe,2021-01-15T10:00:00Z,3,1"), "text/csv")}
+    client.post("/api/v1/upload/employees", files=employees)
+
+    # Department 3 still has employees, so replace keeps it
+    assert upload("1,Engineering\n2,Sales", "replace") == (0, 1, 1, 1, ["Department 3 is referenced by employees and was not removed"])
+
+def test_upload_reference_invalid_mode(client: TestClient):
+    """Test unknown upload modes are rejected"""
+    files = {"file": ("jobs.csv", BytesIO(b"1,Manager"), "text/csv")}
+    response = client.post("/api/v1/upload/jobs", params={"mode": "merge"}, files=files)
+    assert response.status_code == 422
+
+def test_clean_employees_frame():
+    """Test column-wise cleaning drops invalid rows and coerces types"""
+    raw = pd.DataFrame({
+        'id': ['1', '2', 'x', '4', '5'],
+        'name': ['John Doe', None, 'Bob Johnson', 'Alice Brown', 'Eve Miller'],
+        'datetime': ['2021-01-15T10:00:00Z', '2021-02-20T11:00:00Z', '2021-03-10T12:00:00Z', 'not a date', '2021-05-01T08:30:00Z'],
+        'department_id': ['1', '2', '1', '1', None],
+        'job_id': ['3', '2', '1', '1', '200'],
+    })
+    batch = CSVProcessor.clean_employees_frame(raw, ReferenceIds(np.array([1, 2]), np.array([1, 2, 3])))
+
+    assert list(batch.columns) == ['id', 'name', 'datetime', 'department_id', 'job_id']
+    assert batch['id'].tolist() == [1]
+    assert batch['datetime'].tolist() == [pd.Timestamp(2021, 1, 15, 10)]
+    assert str(batch['department_id'].dtype) == 'Int64'
+    assert batch.attrs['rejected'] == {'missing_name': 1, 'invalid_id': 1, 'invalid_datetime': 1, 'unknown_job': 1}
+
+def test_iter_line_chunks():
+    """Test chunks are extended to end on a line boundary"""
+    content = b"1,John Doe,2021-01-15T10:00:00Z,1,1\n2,Jane Smith,2021-02-20T11:00:00Z,2,2\n3,Bob"
+    chunks = list(CSVProcessor.iter_line_chunks(BytesIO(content), 10))
+
+    assert chunks == [b"1,John Doe,2021-01-15T10:00:00Z,1,1\n", b"2,Jane Smith,2021-02-20T11:00:00Z,2,2\n", b"3,Bob"]
+
+def test_parallel_parsing_matches_serial():
+    """Test batches parsed in worker processes come back complete and in file order"""
+    content = "".join(
+        f"{i},Employee {i},2021-{i % 12 + 1:02d}-01T10:00:00Z,{i % 12 + 1},{i % 183 + 1}\n" for i in range(1, 501)
+    ).encode()
+
+    serial = pd.concat(CSVProcessor.iter_employee_batches(BytesIO(content), 64))
+    parallel = list(CSVProcessor.iter_employee_batches_parallel(BytesIO(content), 64, workers=2, chunk_bytes=2048))
+
+    assert len(parallel) > 2
+    pd.testing.assert_frame_equal(pd.concat(parallel).reset_index(drop=True), serial.reset_index(drop=True))
+
+def test_upload_employees_parse_workers(client: TestClient, reference_data):
+    """Test employees upload parsed by a process pool"""
+    csv_content = b"1,John Doe,2021-01-15T10:00:00Z,1,1\n2,Jane Smith,2021-02-20T11:00:00Z,2,2\n\n"
+    files = {"file": ("employees.csv", BytesIO(csv_content), "text/csv")}
+
+    response = client.post("/api/v1/upload/employees", params={"parse_workers": 2}, files=files)
+    assert response.status_code == 200
+    assert response.json()["processed_rows"] == 2
+
+def test_detect_upload_format():
+    """Test columnar files are recognised by magic bytes before their extension"""
+    parquet = BytesIO()
+    pd.DataFrame({'id': [1]}).to_parquet(parquet)
+
+    assert CSVProcessor.detect_format("employees.csv", BytesIO(b"1,John")) == 'csv'
+    assert CSVProcessor.detect_format("export.bin", BytesIO(parquet.getvalue())) == 'parquet'
+    assert CSVProcessor.detect_format("employees.arrow", BytesIO(b"")) == 'arrow'
+    with pytest.raises(ValueError):
+        CSVProcessor.detect_format("employees.txt", BytesIO(b"1,John"))
+
+def test_upload_parquet_and_arrow(client: TestClient):
+    """Test reference and employee uploads from Parquet and Arrow IPC files"""
+    departments = BytesIO()
+    pd.DataFrame({'id': [1, 2], 'department': ['Engineering', 'Sales']}).to_parquet(departments)
+    response = client.post("/api/v1/upload/departments", files={"file": ("departments.parquet", BytesIO(departments.getvalue()))})
+    assert response.json()["processed_rows"] == 2
+
+    jobs = BytesIO()
+    pd.DataFrame({'id': [1], 'job': ['Manager']}).to_feather(jobs)
+    response = client.post("/api/v1/upload/jobs", files={"file": ("jobs.arrow", BytesIO(jobs.getvalue()))})
+    assert response.json()["processed_rows"] == 1
+
+    employees = pd.DataFrame({
+        'id': [1, 2, 3],
+        'name': ['John Doe', 'Jane Smith', None],
+        'datetime': pd.to_datetime(['2021-01-15T10:00:00Z', '2021-02-20T11:00:00Z', '2021-03-10T12:00:00Z']),
+        'department_id': pd.array([1, None, 2], dtype='Int64'),
+        'job_id': pd.array([1, 1, None], dtype='Int64'),
+    })
+    parquet = BytesIO()
+    employees.to_parquet(parquet)
+    response = client.post("/api/v1/upload/employees", params={"chunk_size": 2}, files={"file": ("employees.parquet", BytesIO(parquet.getvalue()))})
+    assert response.json()["processed_rows"] == 2
+
+    # Arrow IPC stream written by another system, with its own column names
+    stream = BytesIO()
+    table = pa.table({'emp': [4], 'full_name': ['Bob Johnson'], 'hired': pa.array([datetime(2021, 4, 1)]), 'dept': [2], 'job': [1]})
+    with pa.ipc.new_stream(stream, table.schema) as writer:
+        writer.write_table(table)
+    response = client.post("/api/v1/upload/employees", files={"file": ("employees.arrows", BytesIO(stream.getvalue()))})
+    assert response.json()["processed_rows"] == 1
+
+    hires = client.get("/api/v1/metrics/hiring-by-quarter").json()
+    assert [(row["department"], row["Q1"], row["Q2"]) for row in hires] == [("Engineering", 1, 0), ("Sales", 0, 1)]
+
+EMPLOYEES_CSV = b"""1,John Doe,2021-01-15T10:00:00Z,1,1
+2,Jane Smith,2021-02-20T11:00:00Z,2,2
+3,Bob Johnson,2021-03-10T12:00:00Z,1,3
+"""
+
+def test_detect_compression():
+    """Test compressed uploads are recognised by magic bytes or extension, and must hold CSV"""
+    assert detect_compression("employees.csv", BytesIO(gzip.compress(b"1,John"))) == 'gzip'
+    assert detect_compression("employees.csv.zst", BytesIO(b"")) == 'zstd'
+    assert detect_compression("employees.csv", BytesIO(b"1,John")) is None
+
+    assert compressed_format("employees.csv.gz") == 'csv'
+    assert compressed_format("employees.gz") == 'csv'
+    with pytest.raises(ValueError):
+        compressed_format("employees.parquet.gz")
+
+    source = open_decompressed(BytesIO(gzip.compress(EMPLOYEES_CSV)), 'gzip')
+    assert sum(len(batch) for batch in CSVProcessor.iter_employee_batches(source, 2)) == 3
+
+def test_upload_gzip_employees(client: TestClient, reference_data):
+    """Test gzip-compressed employees and departments CSV uploads"""
+    files = {"file": ("employees.csv.gz", BytesIO(gzip.compress(EMPLOYEES_CSV)), "application/gzip")}
+    response = client.post("/api/v1/upload/employees", params={"chunk_size": 2}, files=files)
+    assert response.status_code == 200
+    assert response.json()["processed_rows"] == 3
+
+    # Detected from the magic bytes whatever the name
+    departments = gzip.compress(b"1,Engineering\n2,Sales\n3,Marketing")
+    files = {"file": ("departments.csv", BytesIO(departments), "text/csv")}
+    response = client.post("/api/v1/upload/departments", files=files)
+    assert response.status_code == 200
+    assert response.json()["processed_rows"] == 1
+
+def test_upload_zstd_employees(client: TestClient, reference_data):
+    """Test zstd-compressed CSV uploads, including multi-frame files"""
+    zstandard = pytest.importorskip("zstandard")
+    compressor = zstandard.ZstdCompressor()
+    lines = EMPLOYEES_CSV.splitlines(keepends=True)
+    content = compressor.compress(lines[0]) + compressor.compress(b"".join(lines[1:]))
+
+    files = {"file": ("employees.csv.zst", BytesIO(content), "application/zstd")}
+    response = client.post("/api/v1/upload/employees", params={"parse_workers": 2}, files=files)
+    assert response.status_code == 200
+    assert response.json()["processed_rows"] == 3
+
+def test_upload_gzip_request_body(client: TestClient, reference_data):
+    """Test request bodies sent with Content-Encoding: gzip are inflated before parsing"""
+    request = client.build_request(
+        "POST", "/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(EMPLOYEES_CSV), "text/csv")}
+    )
+    headers = {"Content-Type": request.headers["Content-Type"], "Content-Encoding": "gzip"}
+
+    response = client.post("/api/v1/upload/employees", content=gzip.compress(request.read()), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["processed_rows"] == 3
+
+    headers["Content-Encoding"] = "br"
+    response = client.post("/api/v1/upload/employees", content=request.read(), headers=headers)
+    assert response.status_code == 415
+
+def test_upload_compressed_parquet_rejected(client: TestClient):
+    """Test compressed columnar files are rejected"""
+    files = {"file": ("employees.parquet.gz", BytesIO(gzip.compress(b"PAR1")), "application/gzip")}
+    response = client.post("/api/v1/upload/employees", files=files)
+    assert response.status_code == 400
+    assert "Only CSV files can be uploaded compressed" in response.json()["detail"]
+
+def test_save_batch_copy_sync_session(test_db):
+    """Test the COPY path also runs on a synchronous psycopg2 session"""
+    batch = CSVProcessor.process_employees_csv(b"1,John Doe,2021-01-15T10:00:00Z,,\n2,Jane Smith,2021-02-20T11:00:00Z,,")[0]
+    assert CSVProcessor.save_batch_to_db(test_db, batch) == (2, 0, [])
+    assert CSVProcessor.save_batch_to_db(test_db, batch) == (0, 2, [])
+
+def test_concurrent_batches_keep_ids_unique(test_engine, test_db):
+    """Test two batches merging the same id with different hire dates at once insert it once"""
+    Session = sessionmaker(bind=test_engine)
+    batches = [
+        CSVProcessor.process_employees_csv(f"1,John Doe,2021-0{month}-15T10:00:00Z,,".encode())[0]
+        for month in (1, 2)
+    ]
+    barrier = threading.Barrier(len(batches))
+
+    def save(batch):
+        db = Session()
+        try:
+            barrier.wait()
+            return CSVProcessor.save_batch_to_db(db, batch)
+        finally:
+            db.close()
+
+    with ThreadPoolExecutor(len(batches)) as executor:
+        results = sorted(executor.map(save, batches))
+
+    assert results == [(0, 1, []), (1, 0, [])]
+    assert test_db.execute(text("SELECT count(*) FROM employees WHERE id = 1")).scalar_one() == 1
+    assert test_db.execute(text("SELECT sum(hired) FROM hiring_rollup")).scalar_one() == 1
+
+def test_employee_partitions_created_on_upload(client: TestClient, reference_data, test_db):
+    """Test uploads create yearly partitions, skip ids already stored in other years and can detach and reload a year"""
+    csv_content = b"1,John Doe,2031-01-15T10:00:00Z,1,1\n2,Jane Smith,2032-02-20T11:00:00Z,2,2\n2,Jane Smith,2032-02-20T11:00:00Z,2,2"
+    response = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")})
+    assert (response.json()["processed_rows"], response.json()["skipped_rows"]) == (2, 1)
+    assert {"employees_y2031", "employees_y2032"} <= set(year_partitions(test_db))
+
+    csv_content = b"1,John Doe,2032-01-15T10:00:00Z,1,1"
+    response = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")})
+    assert (response.json()["processed_rows"], response.json()["skipped_rows"]) == (0, 1)
+
+    detached = detach_year_partition(test_db, 2032)
+    assert detached.startswith("employees_y2032_detached_")
+    assert test_db.query(Employee).count() == 1
+    assert check_rollup_consistency(test_db) == []
+    test_db.commit()
+
+    # The detached row is loaded again rather than counted as unchanged
+    csv_content = b"2,Jane Smith,2032-02-20T11:00:00Z,2,2\n3,Bob Johnson,2032-03-10T12:00:00Z,1,1"
+    data = client.post("/api/v1/upload/employees", files={"file": ("employees.csv", BytesIO(csv_content), "text/csv")}).json()
+    assert (data["processed_rows"], data["unchanged_rows"], data["errors"]) == (2, 0, [])
+    assert "employees_y2032" in year_partitions(test_db)
+    assert test_db.execute(text("SELECT count(*) FROM employees_y2032")).scalar_one() == 2
+    assert test_db.execute(text("SELECT count(*) FROM employees_default")).scalar_one() == 0
+
+    test_db.execute(text(f"DROP TABLE {detached}"))
+    test_db.commit()
+
+def test_save_batch_orm_fallback():
+    """Test non-PostgreSQL engines use the row-by-row ORM path"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    batch = CSVProcessor.process_employees_csv(b"1,John Doe,2021-01-15T10:00:00Z,,\n2,Jane Smith,2021-02-20T11:00:00Z,,")[0]
+    assert CSVProcessor.save_batch_to_db(db, batch) == (2, 0, [])
+    assert CSVProcessor.save_batch_to_db(db, batch.iloc[:1]) == (0, 1, [])
+    assert db.query(Employee).count() == 2
+    assert db.get(Employee, 1).datetime == datetime(2021, 1, 15, 10)
+    db.close()